@@ -15,15 +15,558 @@
 import sys
 import argparse
 import random
-import pickle
 import time
 import os
+import re
 import csv
+import functools
+import signal
+import socket
+import json
+import glob
+import hashlib
+import errno
+import struct
+import zipfile
+import warnings
+import io
+import gzip
+import bz2
+import lzma
+import contextlib
+import atexit
+import collections
+import collections.abc
+import itertools
+import multiprocessing
+import threading
+from multiprocessing import shared_memory, resource_tracker
 
-import matplotlib.pyplot as plotter
-import matplotlib.colors as mcolors
-from matplotlib.lines import Line2D
 import numpy
+import numpy.lib.format
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# bytes read from disk per block by the block parser
+BLOCK_SIZE = 16 * 1024 * 1024
+# rows between the byte offset checkpoints of a row index
+ROW_INDEX_INTERVAL = 65536
+# rows parsed by the csv module before their values are moved into typed numpy columns
+ROW_FLUSH_INTERVAL = 65536
+# storage types of --dtype, "auto" picks the most compact one holding every value of a column exactly
+COLUMN_DTYPES = ("float64", "float32", "int64", "int32", "auto")
+# session file shared by --sessionstart and --sessioncontinue
+SESSION_FILE = "csvsession.columns"
+SESSION_MAGIC = b"CSVCOLS1"
+# column buffers in a session file start on multiples of this many bytes
+SESSION_ALIGN = 64
+# rows summarized by each minimum and maximum of the zone maps stored in session files
+ZONE_MAP_ROWS = 65536
+# socket of a plot server started with --server
+SESSION_SOCKET = "csvsession.sock"
+# cache of previously loaded CSV files, used unless --nocache
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "csv_analyzer")
+CACHE_SIZE_MB = 2048
+# compressed inputs are recognized by file extension, .zst needs the zstandard module
+COMPRESSED_EXTENSIONS = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz", ".zst": "zstd"}
+ZSTD_FRAME_MAGIC = 0xFD2FB528
+# columnar inputs and --export outputs by file extension, Arrow IPC and Parquet need the pyarrow module
+COLUMNAR_EXTENSIONS = {".npz": "npz", ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow", ".parquet": "parquet"}
+# rows per block streamed from, and per record batch or row group written to, a columnar file
+COLUMNAR_BLOCK_ROWS = 1048576
+# relative error of the percentiles reported by --stats, and the percentiles reported
+SKETCH_ACCURACY = 0.01
+STATS_PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+# row windows of --page kept in memory, the shown one and those around it
+PAGE_CACHE_WINDOWS = 8
+
+# plotting modules, imported by load_matplotlib once a figure is actually drawn
+plotter = None
+mcolors = None
+Line2D = None
+PolyCollection = None
+
+def load_matplotlib(headless=False):
+    '''import the plotting modules on first use, headless plots select Agg without probing for a GUI'''
+    global plotter, mcolors, Line2D, PolyCollection
+    if plotter is None:
+        import matplotlib
+        if headless:
+            matplotlib.use('Agg')
+        import matplotlib.pyplot as plotter
+        import matplotlib.colors as mcolors
+        from matplotlib.lines import Line2D
+        from matplotlib.collections import PolyCollection
+    elif headless and plotter.get_backend().lower() != 'agg':
+        plotter.switch_backend('Agg')
+
+# Arrow IPC and Parquet support, imported by load_pyarrow once such a file is read or written
+pyarrow = None
+
+def load_pyarrow(filename, action="reading"):
+    '''import pyarrow on first use, it is optional and slow to import'''
+    global pyarrow
+    if pyarrow is None:
+        try:
+            import pyarrow
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:
+            raise IOError("%s %s needs the pyarrow module" % (action, filename))
+
+def parse_csv_block(block, ncols):
+    '''convert a block of complete numeric CSV lines into a 2D array with one column per field'''
+    block = block.replace(b'\r', b'').rstrip(b'\n')
+    if len(block) == 0:
+        return numpy.empty((0, ncols))
+
+    nrows = block.count(b'\n') + 1
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        try:
+            values = numpy.fromstring(block.replace(b'\n', b','), dtype=numpy.float64, sep=',')
+        except (ValueError, DeprecationWarning):
+            values = None
+
+    if values is None or values.size != nrows * ncols:
+        # blank lines, empty or malformed fields, fall back to parsing each line, empty fields are missing values
+        rows = [[float(ele) if len(ele.strip()) > 0 else numpy.nan for ele in line.split(b',')]
+                for line in block.split(b'\n') if len(line) > 0]
+        values = numpy.array(rows, dtype=numpy.float64)
+        if values.ndim != 2 or values.shape[1] != ncols:
+            raise ValueError("CSV block does not have %i numeric columns per row" % ncols)
+        return values
+
+    return values.reshape(nrows, ncols)
+
+def csv_codec(filename):
+    '''the compression of a CSV file going by its extension, None for plain text'''
+    return COMPRESSED_EXTENSIONS.get(os.path.splitext(filename)[1].lower())
+
+def columnar_format(filename):
+    '''the columnar format of a file going by its extension, None for CSV text'''
+    return COLUMNAR_EXTENSIONS.get(os.path.splitext(filename)[1].lower())
+
+@contextlib.contextmanager
+def open_csv(filename, text=False):
+    '''open a plain or compressed CSV file for streaming reads, yields the (decompressed) file and the
+    underlying file on disk, whose position tracks progress through the compressed bytes'''
+    codec = csv_codec(filename)
+    if codec == "zstd" and zstandard is None:
+        raise IOError("reading %s needs the zstandard module" % filename)
+
+    with open(filename, 'rb') as rawfile:
+        if codec == "gzip":
+            csvfile = gzip.GzipFile(fileobj=rawfile)
+        elif codec == "bz2":
+            csvfile = bz2.BZ2File(rawfile)
+        elif codec == "xz":
+            csvfile = lzma.LZMAFile(rawfile)
+        elif codec == "zstd":
+            reader = zstandard.ZstdDecompressor().stream_reader(rawfile, read_across_frames=True, closefd=False)
+            csvfile = io.BufferedReader(reader, BLOCK_SIZE)
+        else:
+            csvfile = rawfile
+        if text:
+            csvfile = io.TextIOWrapper(csvfile)
+        try:
+            yield csvfile, rawfile
+        finally:
+            if csvfile is not rawfile:
+                csvfile.close()
+
+def split_compressed_members(filename, codec):
+    '''byte offsets where the independently compressed members (BGZF gzip) or frames (zstd) of a file
+    start, followed by the file size, None if the file cannot be split without decompressing it'''
+    offsets = []
+    with open(filename, 'rb') as csvfile:
+        size = os.fstat(csvfile.fileno()).st_size
+        pos = 0
+        while pos < size:
+            offsets.append(pos)
+            csvfile.seek(pos)
+            if codec == "gzip":
+                # BGZF members carry their own size in a BC extra subfield
+                header = csvfile.read(18)
+                if len(header) < 18 or header[:4] != b'\x1f\x8b\x08\x04' or header[12:16] != b'BC\x02\x00':
+                    return None
+                pos += struct.unpack('<H', header[16:18])[0] + 1
+            elif codec == "zstd":
+                header = csvfile.read(5)
+                if len(header) < 5:
+                    return None
+                magic = struct.unpack('<I', header[:4])[0]
+                if 0x184D2A50 <= magic <= 0x184D2A5F:
+                    csvfile.seek(pos + 4)
+                    pos += 8 + struct.unpack('<I', csvfile.read(4))[0]
+                    continue
+                if magic != ZSTD_FRAME_MAGIC:
+                    return None
+                # walk the block headers to the end of the frame
+                descriptor = header[4]
+                single = (descriptor >> 5) & 1
+                pos += 5 + (1 - single) + (0, 1, 2, 4)[descriptor & 3] + (single, 2, 4, 8)[descriptor >> 6]
+                while True:
+                    csvfile.seek(pos)
+                    block = csvfile.read(3)
+                    if len(block) < 3:
+                        return None
+                    block = block[0] | block[1] << 8 | block[2] << 16
+                    pos += 3 + (1 if (block >> 1) & 3 == 1 else block >> 3)
+                    if block & 1:
+                        break
+                pos += 4 if (descriptor >> 2) & 1 else 0
+            else:
+                return None
+
+    if len(offsets) < 2 or pos != size:
+        return None
+    offsets.append(size)
+    return offsets
+
+def decompress_members(codec, data):
+    '''decompress a run of complete gzip members or zstd frames'''
+    if codec == "gzip":
+        return gzip.decompress(data)
+    reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data), read_across_frames=True)
+    return reader.readall()
+
+def parse_csv_range(task):
+    '''pool worker: parse the lines in a byte range of a CSV file into a shared memory block, one field after another.
+    Compressed ranges hold whole members whose text need not start or end on a line, the partial
+    first and last lines are returned for the caller to join with the neighbouring ranges'''
+    filename, start, end, ncols, fields, codec = task
+    with open(filename, 'rb') as csvfile:
+        csvfile.seek(start)
+        data = csvfile.read(end - start)
+
+    head = tail = b''
+    if codec is not None:
+        data = decompress_members(codec, data)
+        first = data.find(b'\n') + 1
+        last = data.rfind(b'\n') + 1
+        if first == 0:
+            return None, 0, b'', data
+        head, tail, data = data[:first], data[last:], data[first:last]
+    values = parse_csv_block(data, ncols)
+
+    nrows = len(values)
+    if nrows == 0 or len(fields) == 0:
+        return None, nrows, head, tail
+
+    block = shared_memory.SharedMemory(create=True, size=nrows * len(fields) * values.itemsize)
+    columns = numpy.ndarray((len(fields), nrows), dtype=values.dtype, buffer=block.buf)
+    columns[:] = values[:, fields].T
+    del columns
+    block.close()
+    return block.name, nrows, head, tail
+
+def release_shared_block(name):
+    '''unlink a block returned by parse_csv_range without reading it'''
+    if name is not None:
+        block = shared_memory.SharedMemory(name=name)
+        block.close()
+        block.unlink()
+
+class Profiler:
+    '''named stage timers and counters collected for --profile'''
+    def __init__(self, tracing=False):
+        self.stages = collections.OrderedDict()
+        self.started = time.perf_counter()
+        # with tracemalloc, the allocations are kept from the end of the stage holding the most memory
+        self.tracing = tracing
+        self.snapshot = None
+        self.snapshot_stage = ""
+        self.snapshot_size = 0
+
+    def __entry(self, name):
+        if name not in self.stages:
+            self.stages[name] = {"calls": 0, "seconds": 0.0, "rows": 0, "bytes": 0, "peak_rss_mb": 0.0}
+        return self.stages[name]
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.__entry(name)
+            entry["calls"] += 1
+            entry["seconds"] += time.perf_counter() - start
+            entry["peak_rss_mb"] = self.peak_rss_mb()
+            if self.tracing:
+                self.__trace(name)
+
+    def __trace(self, name):
+        import tracemalloc
+        size = tracemalloc.get_traced_memory()[0]
+        if size > self.snapshot_size:
+            self.snapshot = tracemalloc.take_snapshot()
+            self.snapshot_stage = name
+            self.snapshot_size = size
+
+    def write_allocations(self, filename):
+        '''write the largest allocation sites at the end of the stage holding the most memory'''
+        import tracemalloc
+        peak = tracemalloc.get_traced_memory()[1]
+        with open(filename, 'w') as f:
+            f.write("peak traced memory %.1f MB\n" % (peak / 1e6))
+            if self.snapshot is not None:
+                f.write("%.1f MB allocated after stage '%s':\n" % (self.snapshot_size / 1e6, self.snapshot_stage))
+                for stat in self.snapshot.statistics('lineno')[:50]:
+                    f.write(str(stat) + "\n")
+
+    def count(self, name, rows=0, nbytes=0):
+        entry = self.__entry(name)
+        entry["rows"] += rows
+        entry["bytes"] += nbytes
+
+    def peak_rss_mb(self):
+        if resource is None:
+            return 0.0
+        # kilobytes on Linux, bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6
+
+    def summary(self):
+        stages = []
+        for name, entry in self.stages.items():
+            stage = dict(entry, name=name)
+            seconds = entry["seconds"]
+            stage["rows_per_s"] = entry["rows"] / seconds if seconds > 0 else 0.0
+            stage["mb_per_s"] = entry["bytes"] / seconds / 1e6 if seconds > 0 else 0.0
+            stages.append(stage)
+        return {"total_seconds": time.perf_counter() - self.started, "peak_rss_mb": self.peak_rss_mb(),
+                "stages": stages}
+
+    def report(self, jsonfile=""):
+        '''print the stage table, or write it as JSON'''
+        summary = self.summary()
+        if len(jsonfile) > 0:
+            with open(jsonfile, 'w') as f:
+                json.dump(summary, f, indent=1)
+            print("profile written to " + jsonfile)
+            return
+
+        print("%-16s %6s %10s %12s %12s %10s %10s %12s" % ("stage", "calls", "seconds", "rows", "rows/s",
+                                                          "MB", "MB/s", "peak RSS MB"))
+        for stage in summary["stages"]:
+            print("%-16s %6i %10.4f %12i %12.0f %10.1f %10.1f %12.1f" % (
+                stage["name"], stage["calls"], stage["seconds"], stage["rows"], stage["rows_per_s"],
+                stage["bytes"] / 1e6, stage["mb_per_s"], stage["peak_rss_mb"]))
+        print("%-16s %6s %10.4f %12s %12s %10s %10s %12.1f" % ("total", "", summary["total_seconds"], "", "",
+                                                              "", "", summary["peak_rss_mb"]))
+
+# set by --profile, stages are only timed while it is
+PROFILER = None
+NO_PROFILE = contextlib.nullcontext()
+
+def profile_stage(name):
+    '''context timing a named stage when profiling'''
+    if PROFILER is None:
+        return NO_PROFILE
+    return PROFILER.stage(name)
+
+def profile_count(name, rows=0, nbytes=0):
+    if PROFILER is not None:
+        PROFILER.count(name, rows, nbytes)
+
+def start_profiling(jsonfile="", cprofile="", tracefile=""):
+    '''enable the stage profiler and the optional cProfile and tracemalloc dumps, reported at exit'''
+    global PROFILER
+    PROFILER = Profiler(len(tracefile) > 0)
+    profiler = None
+    if len(cprofile) > 0:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    if len(tracefile) > 0:
+        import tracemalloc
+        tracemalloc.start()
+
+    def report():
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile)
+            print("cProfile stats written to " + cprofile)
+        if len(tracefile) > 0:
+            PROFILER.write_allocations(tracefile)
+            tracemalloc.stop()
+            print("allocation sites written to " + tracefile)
+        PROFILER.report(jsonfile)
+
+    atexit.register(report)
+
+class RowIndex:
+    '''sampled row number to byte offset checkpoints of a CSV file, kept in a sidecar file'''
+    def __init__(self, filename, interval=ROW_INDEX_INTERVAL):
+        self.filename = filename
+        self.path = filename + ".rowindex"
+        self.interval = interval
+        self.stamp = (0, 0)
+        self.line_count = 0
+        # offsets[k] is the byte offset of row k * interval, the header is row 0
+        self.offsets = numpy.zeros(1, dtype=numpy.int64)
+
+    def __source_stamp(self):
+        stat = os.stat(self.filename)
+        return stat.st_size, stat.st_mtime_ns
+
+    def load(self):
+        '''read the sidecar file, False if it is missing or the CSV file changed since it was built'''
+        try:
+            with open(self.path, 'rb') as f:
+                index = numpy.load(f)
+                stamp = tuple(int(v) for v in index["stamp"])
+                interval = int(index["interval"])
+                line_count = int(index["line_count"])
+                offsets = index["offsets"]
+        except (OSError, ValueError, KeyError):
+            return False
+
+        if stamp != self.__source_stamp() or interval != self.interval:
+            return False
+
+        self.stamp = stamp
+        self.line_count = line_count
+        self.offsets = offsets
+        return True
+
+    def build(self):
+        '''count the lines of the CSV file, sampling the offset of every interval-th row'''
+        self.stamp = self.__source_stamp()
+        checkpoints = [numpy.zeros(1, dtype=numpy.int64)]
+        newlines = 0
+        base = 0
+        last = b''
+        with open(self.filename, 'rb') as csvfile:
+            while True:
+                chunk = csvfile.read(BLOCK_SIZE)
+                if not chunk:
+                    break
+                ends = numpy.flatnonzero(numpy.frombuffer(chunk, dtype=numpy.uint8) == ord('\n'))
+                # the row following the n-th newline is row n
+                first = -(newlines + 1) % self.interval
+                checkpoints.append(ends[first::self.interval] + base + 1)
+                newlines += len(ends)
+                base += len(chunk)
+                last = chunk[-1:]
+
+        self.line_count = newlines + (1 if len(last) > 0 and last != b'\n' else 0)
+        self.offsets = numpy.concatenate(checkpoints)
+
+    def save(self):
+        tmpname = self.path + ".tmp"
+        try:
+            with open(tmpname, 'wb') as f:
+                numpy.savez(f, stamp=numpy.array(self.stamp, dtype=numpy.int64), interval=self.interval,
+                            line_count=self.line_count, offsets=self.offsets)
+            os.replace(tmpname, self.path)
+        except OSError as err:
+            print("unable to save row index {0}: {1}".format(self.path, err.strerror))
+
+    def seek_row(self, row):
+        '''the closest checkpoint at or before a row as (row number, byte offset)'''
+        k = min(row // self.interval, len(self.offsets) - 1)
+        return k * self.interval, int(self.offsets[k])
+
+    def end_offset(self, row):
+        '''byte offset of the first checkpoint after a row, or the end of the file'''
+        k = row // self.interval + 1
+        if k < len(self.offsets):
+            return int(self.offsets[k])
+        return self.stamp[0]
+
+def parse_dtypes(text):
+    '''map column names to storage types from a --dtype spec like "float32" or "auto,t=float64,count=int32",
+    a type without a column name applies to every plotted column but not to the x-axis'''
+    dtypes = {}
+    for item in text.split(","):
+        item = item.strip()
+        if len(item) == 0:
+            continue
+        col, sep, dtype = item.rpartition("=")
+        if dtype not in COLUMN_DTYPES:
+            raise ValueError("unknown dtype '%s', use one of %s" % (dtype, ", ".join(COLUMN_DTYPES)))
+        dtypes[col.strip()] = dtype
+    return dtypes
+
+def compact_column(values):
+    '''the column in the smallest of int32, int64, float32 and float64 that holds all its values exactly'''
+    if len(values) == 0 or values.dtype != numpy.float64:
+        return values
+    if numpy.isfinite(values).all() and numpy.array_equal(values, numpy.trunc(values)):
+        for dtype in (numpy.int32, numpy.int64):
+            info = numpy.iinfo(dtype)
+            if info.min <= values.min() and values.max() <= info.max:
+                return values.astype(dtype)
+    compact = values.astype(numpy.float32)
+    nans = numpy.isnan(values)
+    if numpy.array_equal(numpy.isnan(compact), nans) and numpy.array_equal(compact[~nans], values[~nans]):
+        return compact
+    return values
+
+def cast_column(name, values, dtype):
+    '''the column in a --dtype it names, integer types only hold whole numbers within their range'''
+    dtype = numpy.dtype(dtype)
+    if dtype.kind == "i" and len(values) > 0 and values.dtype != dtype:
+        if values.dtype.kind == "f" and not (numpy.isfinite(values).all() and
+                                             numpy.array_equal(values, numpy.trunc(values))):
+            raise ValueError("column '%s' has missing or fractional values, it cannot be stored as %s" %
+                             (name, dtype.name))
+        info = numpy.iinfo(dtype)
+        if values.min() < info.min or values.max() > info.max:
+            raise ValueError("column '%s' has values outside the range of %s" % (name, dtype.name))
+    return values.astype(dtype, copy=False)
+
+def zone_map(values, rows=ZONE_MAP_ROWS):
+    '''per chunk minimum, maximum and NaN flag of a column, an all NaN chunk has the empty range (inf, -inf)'''
+    if len(values) == 0:
+        return numpy.empty(0), numpy.empty(0), numpy.empty(0, dtype=bool)
+    starts = numpy.arange(0, len(values), rows)
+    mins = numpy.fmin.reduceat(values, starts).astype(numpy.float64)
+    maxs = numpy.fmax.reduceat(values, starts).astype(numpy.float64)
+    if values.dtype.kind == "f":
+        nans = numpy.logical_or.reduceat(numpy.isnan(values), starts)
+        empty = numpy.isnan(mins)
+        mins[empty] = numpy.inf
+        maxs[empty] = -numpy.inf
+    else:
+        nans = numpy.zeros(len(starts), dtype=bool)
+    return mins, maxs, nans
+
+class ColumnBuffer:
+    '''numpy column that grows geometrically as blocks of values are appended'''
+    def __init__(self, capacity=0, dtype=numpy.float64):
+        self.values = numpy.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        end = self.size + len(values)
+        if end > len(self.values):
+            grown = numpy.empty(max(end, 2 * len(self.values)), dtype=self.values.dtype)
+            grown[:self.size] = self.values[:self.size]
+            self.values = grown
+        self.values[self.size:end] = values
+        self.size = end
+
+    def view(self):
+        '''the filled part of the buffer without copying, valid until the buffer grows'''
+        return self.values[:self.size]
+
+    def array(self):
+        '''the filled part of the buffer, releasing any unused capacity'''
+        if self.size < len(self.values):
+            self.values = self.values[:self.size].copy()
+        return self.values
 
 class BigCSVReader:
     def __init__(self):
@@ -31,8 +574,16 @@ class BigCSVReader:
         self.data = {}
         self.xaxis = []
         self.idx_xaxis = -1
+        self.buffers = {}
+        self.xbuffer = None
+        self.progress_file = None
+        self.file_size = 0
+        self.follow = None
+        self.dtypes = {}
+        self.xaxis_name = None
 
     def __read_headers(self, row, columns, xaxis_name):
+        self.xaxis_name = xaxis_name
         i = 0
         for ele in row:
             if ele in columns:
@@ -54,35 +605,470 @@ class BigCSVReader:
         if self.idx_xaxis < 0:
             self.xaxis.append(float(row_num - 1))
 
+    def __report_progress(self, row_num, row_count, offset=None):
+        if row_count is None:
+            # single pass, estimate progress from the byte offset
+            if offset is None:
+                offset = self.progress_file.tell()
+            percent = 100.0 * offset / max(self.file_size, 1)
+            print("processed %i rows, %.0f%% of file" % (row_num, min(percent, 100.0)))
+        else:
+            print("processed %i rows of %i" % (row_num, row_count))
+
     def __process_row_data(self, row, row_num, columns, xaxis_name, rowstart, rowend, row_count):
         if rowend > 0 and row_num > rowend:
             return False
 
         if row_num == 0:
             self.__read_headers(row, columns, xaxis_name)
+            self.__init_buffers(columns, 0)
         elif row_num >= rowstart:
             self.__read_row(row, row_num)
+            if len(self.xaxis) >= ROW_FLUSH_INTERVAL:
+                self.__flush_rows()
 
         if row_num % 100000 == 0:
-            print("processed %i rows of %i" % (row_num, row_count))
+            self.__report_progress(row_num, row_count)
 
         return True
 
-    def get_csv_data(self, filename, columns, xaxis_name, rowstart, rowend, rawmode=False):
+    def __read_blocks(self, csvfile, ncols, row_num=1):
+        '''yield the row number and parsed values of each block of complete lines'''
+        remainder = b''
+        while True:
+            chunk = csvfile.read(BLOCK_SIZE)
+            if not chunk:
+                break
+            chunk = remainder + chunk
+            cut = chunk.rfind(b'\n') + 1
+            remainder = chunk[cut:]
+            if cut == 0:
+                continue
+            values = parse_csv_block(chunk[:cut], ncols)
+            yield row_num, values
+            row_num += len(values)
+
+        if len(remainder.strip()) > 0:
+            yield row_num, parse_csv_block(remainder, ncols)
+
+    def __dtype_name(self, col):
+        '''--dtype of a column, the x-axis only changes type when named'''
+        if col == self.xaxis_name:
+            return self.dtypes.get(col, "float64")
+        return self.dtypes.get(col, self.dtypes.get("", "float64"))
+
+    def __convert(self, col, values):
+        '''columns read from a columnar file keep their type unless --dtype gives one'''
+        if col in self.dtypes or (col != self.xaxis_name and "" in self.dtypes):
+            dtype = self.__dtype_name(col)
+            if dtype == "auto":
+                return compact_column(numpy.asarray(values, dtype=numpy.float64))
+            return cast_column(col, numpy.asarray(values), dtype)
+        return values
+
+    def __column_dtype(self, col):
+        '''storage type of a column while parsing, "auto" and integer columns are converted once complete'''
+        dtype = self.__dtype_name(col)
+        if dtype == "auto" or numpy.dtype(dtype).kind == "i":
+            return numpy.float64
+        return numpy.dtype(dtype)
+
+    def __init_buffers(self, columns, capacity):
+        self.buffers = {}
+        for col in columns:
+            self.buffers[col] = ColumnBuffer(capacity if col in self.headers.values() else 0,
+                                             self.__column_dtype(col))
+        self.xbuffer = ColumnBuffer(capacity, self.__column_dtype(self.xaxis_name))
+
+    def __flush_rows(self):
+        '''move the values parsed by the csv module into the typed column buffers'''
+        for col, buffer in self.buffers.items():
+            if len(self.data[col]) > 0:
+                buffer.extend(numpy.array(self.data[col], dtype=numpy.float64))
+                self.data[col] = []
+        self.xbuffer.extend(numpy.array(self.xaxis, dtype=numpy.float64))
+        self.xaxis = []
+
+    def __store_block(self, row_num, nrows, fields, rowstart, rowend):
+        '''copy the requested rows of a parsed block, indexed by field number, into the column buffers'''
+        first = max(rowstart - row_num, 0)
+        last = nrows
+        if rowend > 0:
+            last = min(last, rowend - row_num + 1)
+        if last <= 0:
+            return False
+
+        if first < last:
+            for col_idx, name in self.headers.items():
+                self.buffers[name].extend(fields[col_idx][first:last])
+            if self.idx_xaxis >= 0:
+                self.xbuffer.extend(fields[self.idx_xaxis][first:last])
+            else:
+                self.xbuffer.extend(numpy.arange(row_num + first - 1, row_num + last - 1, dtype=numpy.float64))
+
+        return rowend <= 0 or row_num + nrows <= rowend
+
+    def __finish_buffers(self):
+        for col, buffer in self.buffers.items():
+            self.data[col] = self.__compact(col, buffer.array())
+        self.xaxis = self.__compact(self.xaxis_name, self.xbuffer.array())
+        self.buffers = {}
+        self.xbuffer = None
+
+    def __compact(self, col, values):
+        dtype = self.__dtype_name(col)
+        if dtype == "auto":
+            return compact_column(values)
+        return cast_column(col, values, dtype)
+
+    def __process_block_data(self, csvfile, columns, xaxis_name, rowstart, rowend, line_count, row_count,
+                             start_row=1, start_offset=None):
+        '''parse blocks of raw bytes straight into numpy column arrays'''
+        header = next(csv.reader([csvfile.readline().decode()]))
+        self.__read_headers(header, columns, xaxis_name)
+        if start_offset is not None:
+            csvfile.seek(start_offset)
+
+        # without a line count the buffers start empty and grow geometrically
+        capacity = 0
+        if line_count > 0:
+            last_row = line_count - 1
+            if rowend > 0:
+                last_row = min(last_row, rowend)
+            capacity = max(last_row - max(rowstart, start_row) + 1, 0)
+        self.__init_buffers(columns, capacity)
+        for row_num, values in self.__read_blocks(csvfile, len(header), start_row):
+            more = self.__store_block(row_num, len(values), values.T, rowstart, rowend)
+            self.__report_progress(row_num + len(values) - 1, row_count)
+            if not more:
+                break
+
+        self.__finish_buffers()
+
+    def __split_ranges(self, csvfile, jobs, end_offset):
+        '''split the lines up to an offset into byte ranges that end on line boundaries'''
+        start = csvfile.tell()
+        step = max(min(BLOCK_SIZE, (end_offset - start) // jobs), 1)
+        ranges = []
+        while start < end_offset:
+            csvfile.seek(min(start + step, end_offset) - 1)
+            csvfile.readline()
+            end = csvfile.tell()
+            ranges.append((start, end))
+            start = end
+        return ranges
+
+    def __store_shared_block(self, name, nrows, fields, row_num, rowstart, rowend):
+        '''copy a block parsed by a pool worker out of shared memory and release it'''
+        if name is None:
+            return self.__store_block(row_num, nrows, {}, rowstart, rowend)
+
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            columns = numpy.ndarray((len(fields), nrows), dtype=numpy.float64, buffer=block.buf)
+            more = self.__store_block(row_num, nrows, dict(zip(fields, columns)), rowstart, rowend)
+            del columns
+        finally:
+            block.close()
+            block.unlink()
+        return more
+
+    def __split_members(self, offsets, jobs):
+        '''group the independently compressed members of a file into byte ranges'''
+        step = max(min(BLOCK_SIZE // 4, offsets[-1] // jobs), 1)
+        ranges = []
+        start = offsets[0]
+        for offset in offsets[1:]:
+            if offset - start >= step or offset == offsets[-1]:
+                ranges.append((start, offset))
+                start = offset
+        return ranges
+
+    def __process_parallel_data(self, filename, columns, xaxis_name, rowstart, rowend, jobs,
+                                start_row=1, start_offset=None, end_offset=None, members=None):
+        '''parse newline aligned byte ranges of the file, or ranges of compressed members, in a process pool'''
+        codec = None
+        if members is not None:
+            codec = csv_codec(filename)
+            with open_csv(filename) as (csvfile, rawfile):
+                header = next(csv.reader([csvfile.readline().decode()]))
+            ranges = self.__split_members(members, jobs)
+        else:
+            with open(filename, 'rb') as csvfile:
+                header = next(csv.reader([csvfile.readline().decode()]))
+                if start_offset is not None:
+                    csvfile.seek(start_offset)
+                if end_offset is None:
+                    end_offset = self.file_size
+                ranges = self.__split_ranges(csvfile, jobs, end_offset)
+        self.__read_headers(header, columns, xaxis_name)
+        self.__init_buffers(columns, 0)
+
+        fields = sorted(self.headers.keys())
+        if self.idx_xaxis >= 0 and self.idx_xaxis not in fields:
+            fields.append(self.idx_xaxis)
+        ncols = len(header)
+        tasks = ((filename, start, end, ncols, fields, codec) for start, end in ranges)
+
+        # keep a bounded number of ranges in flight so blocks are consumed in file order
+        row_num = start_row
+        more = True
+        pending = collections.deque()
+        # lines split between compressed ranges, the first complete one is the header
+        partial = b''
+        header_pending = codec is not None
+        # workers must share our tracker so blocks they create are forgotten once we unlink them
+        resource_tracker.ensure_running()
+        with multiprocessing.Pool(jobs) as pool:
+            for task in itertools.islice(tasks, 2 * jobs):
+                pending.append((task[2], pool.apply_async(parse_csv_range, (task,))))
+
+            name = None
+            try:
+                while len(pending) > 0:
+                    end, result = pending.popleft()
+                    name, nrows, head, tail = result.get()
+                    if not more:
+                        # past the row end, only release the blocks already parsed
+                        release_shared_block(name)
+                        name = None
+                        continue
+
+                    if len(head) > 0:
+                        line = partial + head
+                        partial = tail
+                        if header_pending:
+                            header_pending = False
+                        else:
+                            values = parse_csv_block(line, ncols)
+                            more = self.__store_block(row_num, len(values), values.T, rowstart, rowend)
+                            row_num += len(values)
+                    else:
+                        partial += tail
+                    # the block is released by whichever call takes it, even when that call fails
+                    shared, name = name, None
+                    if more:
+                        more = self.__store_shared_block(shared, nrows, fields, row_num, rowstart, rowend)
+                        row_num += nrows
+                    else:
+                        release_shared_block(shared)
+                    self.__report_progress(row_num - 1, None, end)
+                    if more:
+                        for task in itertools.islice(tasks, 1):
+                            pending.append((task[2], pool.apply_async(parse_csv_range, (task,))))
+            except BaseException:
+                # a failed range or block, release this block and those of the ranges still in flight
+                release_shared_block(name)
+                for end, result in pending:
+                    try:
+                        release_shared_block(result.get()[0])
+                    except Exception:
+                        pass
+                raise
+
+        # the last line of a compressed file without a trailing newline
+        if more and not header_pending and len(partial.strip()) > 0:
+            values = parse_csv_block(partial, ncols)
+            self.__store_block(row_num, len(values), values.T, rowstart, rowend)
+
+        self.__finish_buffers()
+
+    def follow_csv_data(self, filename, columns, xaxis_name, rowstart, rowend, dtypes=None):
+        '''parse the complete lines written so far, keeping the column buffers open for read_appended'''
+        self.dtypes = dtypes or {}
+        self.follow = {"filename": filename, "columns": columns, "xaxis_name": xaxis_name,
+                       "rowstart": rowstart, "rowend": rowend, "offset": 0, "row_num": 1, "ncols": 0}
+        # empty columns until the header has been written, a new log file may not have one yet
+        self.xaxis_name = xaxis_name
+        self.__init_buffers(columns, 0)
+        self.__view_buffers()
+        self.read_appended()
+        print("CSV loading complete")
+        return self.data, self.xaxis
+
+    def __view_buffers(self):
+        for col, buffer in self.buffers.items():
+            self.data[col] = buffer.view()
+        self.xaxis = self.xbuffer.view()
+
+    def read_appended(self):
+        '''parse the complete lines appended since the last read, returns the index of the first new row'''
+        state = self.follow
+        start = self.xbuffer.size if self.xbuffer is not None else 0
+        size = os.path.getsize(state["filename"])
+        if size < state["offset"]:
+            # truncated or replaced, start over
+            state["offset"] = 0
+            state["row_num"] = 1
+            start = 0
+            self.__init_buffers(state["columns"], 0)
+            self.__view_buffers()
+        if size == state["offset"]:
+            return start
+
+        with open(state["filename"], 'rb') as csvfile:
+            csvfile.seek(state["offset"])
+            if state["offset"] == 0:
+                header = csvfile.readline()
+                if not header.endswith(b'\n'):
+                    return start
+                header = next(csv.reader([header.decode()]))
+                self.headers = {}
+                self.idx_xaxis = -1
+                self.__read_headers(header, state["columns"], state["xaxis_name"])
+                self.__init_buffers(state["columns"], 0)
+                state["ncols"] = len(header)
+                state["offset"] = csvfile.tell()
+
+            while True:
+                chunk = csvfile.read(BLOCK_SIZE)
+                # only complete lines, a partly written one is read again next time
+                cut = chunk.rfind(b'\n') + 1
+                if cut > 0:
+                    values = parse_csv_block(chunk[:cut], state["ncols"])
+                    self.__store_block(state["row_num"], len(values), values.T, state["rowstart"], state["rowend"])
+                    state["row_num"] += len(values)
+                    state["offset"] += cut
+                    csvfile.seek(state["offset"])
+                if len(chunk) < BLOCK_SIZE:
+                    break
+
+        self.__view_buffers()
+        return start
+
+    def iter_csv_blocks(self, filename, columns, xaxis_name, rowstart, rowend):
+        '''yield the x-axis and the requested columns of each block of rows in the window, keeping none of them'''
+        if columnar_format(filename) is not None:
+            source = ColumnarFile(filename)
+            self.idx_xaxis = 0 if xaxis_name in source.names() else -1
+            self.rows_seen = source.rows
+            yield from source.blocks(columns, xaxis_name, rowstart, rowend)
+            return
+
+        self.file_size = os.path.getsize(filename)
+        with open_csv(filename) as (csvfile, rawfile):
+            self.progress_file = rawfile
+            header = next(csv.reader([csvfile.readline().decode()]))
+            self.__read_headers(header, columns, xaxis_name)
+            self.rows_seen = 0
+            for row_num, values in self.__read_blocks(csvfile, len(header)):
+                self.rows_seen = row_num + len(values) - 1
+                first = max(rowstart - row_num, 0)
+                last = len(values)
+                if rowend > 0:
+                    last = min(last, rowend - row_num + 1)
+                if last <= 0:
+                    break
+                if first < last:
+                    block = values[first:last]
+                    if self.idx_xaxis >= 0:
+                        x = block[:, self.idx_xaxis]
+                    else:
+                        x = numpy.arange(row_num + first - 1, row_num + last - 1, dtype=numpy.float64)
+                    yield x, {name: block[:, col_idx] for col_idx, name in self.headers.items()}
+                self.__report_progress(row_num + len(values) - 1, None)
+
+    def get_csv_data(self, filename, columns, xaxis_name, rowstart, rowend, rawmode=False, blockmode=False,
+                     singlepass=False, jobs=1, useindex=True, dtypes=None):
         '''parse the raw CSV data from the source file using raw file I/O'''
+        self.dtypes = dtypes or {}
+
+        if columnar_format(filename) is not None:
+            # nothing to parse, the requested columns and rows are read straight from the file
+            self.xaxis_name = xaxis_name
+            self.data, self.xaxis = ColumnarFile(filename).read(columns, xaxis_name, rowstart, rowend)
+            for col in columns:
+                self.data[col] = self.__convert(col, self.data[col])
+            self.xaxis = self.__convert(xaxis_name, self.xaxis)
+            return self.data, self.xaxis
 
         for col in columns:
             self.data[col] = []
 
-        row_count = 0
+        row_count = None
+        line_count = 0
         row_num = 0
+        self.file_size = os.path.getsize(filename)
+
+        # compressed files are streamed once, byte offsets into them cannot be indexed or seeked
+        codec = csv_codec(filename)
+        if codec is not None:
+            useindex = False
+            singlepass = True
+
+        # the row index replaces the line count pass, single pass loads only use an existing one
+        index = None
+        if useindex:
+            index = RowIndex(filename)
+            if not index.load():
+                if singlepass or jobs > 1:
+                    index = None
+                else:
+                    with profile_stage("row index"):
+                        index.build()
+                        index.save()
+                    profile_count("row index", index.line_count, self.file_size)
+
+        start_row = 1
+        start_offset = None
+        end_offset = None
+        if index is not None:
+            row_count = index.line_count
+            line_count = row_count
+            if rowstart != rowend:
+                row_count = min(row_count, rowend - rowstart)
+
+            # seek straight to the checkpoint before the first requested row
+            checkpoint_row, offset = index.seek_row(max(rowstart, 1))
+            if checkpoint_row > 0:
+                start_row = checkpoint_row
+                start_offset = offset
+            if rowend > 0:
+                end_offset = index.end_offset(rowend)
+        elif not singlepass and jobs <= 1:
+            with profile_stage("line count"), open(filename, 'r') as csvfile:
+                row_count = sum(1 for row in csvfile)
+            profile_count("line count", row_count, self.file_size)
+            line_count = row_count
+            if rowstart != rowend:
+                row_count = min(row_count, rowend - rowstart)
+
+        members = None
+        if jobs > 1 and codec is not None:
+            members = split_compressed_members(filename, codec)
+            if members is None:
+                # a single stream has to be decompressed in order, parse it on the way
+                print("%s is not split into independently compressed members, reading it in one process" % filename)
+                jobs = 1
+                blockmode = True
+
+        if jobs > 1:
+            # parallel parsing always reads the file once, by byte range
+            self.__process_parallel_data(filename, columns, xaxis_name, rowstart, rowend, jobs,
+                                         start_row, start_offset, end_offset, members)
+            print("CSV loading complete")
+            return self.data, self.xaxis
+
+        if blockmode:
+            with open_csv(filename) as (csvfile, rawfile):
+                self.progress_file = rawfile
+                self.__process_block_data(csvfile, columns, xaxis_name, rowstart, rowend, line_count, row_count,
+                                          start_row, start_offset)
+            print("CSV loading complete")
+            return self.data, self.xaxis
+
+        with open_csv(filename, True) as (csvfile, rawfile):
+            self.progress_file = rawfile
+            if start_offset is not None:
+                header = csvfile.readline()
+                if not rawmode:
+                    header_row = next(csv.reader([header]))
+                else:
+                    header_row = header.rstrip().split(',')
+                self.__process_row_data(header_row, 0, columns, xaxis_name, rowstart, rowend, row_count)
+                csvfile.seek(start_offset)
+                row_num = start_row
 
-        with open(filename, 'r') as csvfile:
-            row_count = sum(1 for row in csvfile)
-        if rowstart != rowend:
-            row_count = min(row_count, rowend - rowstart)
-
-        with open(filename, 'r') as csvfile:
             # fails on big files ??
             if not rawmode:
                 reader = csv.reader(csvfile)
@@ -98,11 +1084,1169 @@ class BigCSVReader:
                         break
                     row_num += 1
 
+        if self.xbuffer is not None:
+            self.__flush_rows()
+            self.__finish_buffers()
+
         print("CSV loading complete")
         return self.data, self.xaxis
 
+def expand_csv_files(patterns):
+    '''the files named by -f in order, glob patterns replaced by their sorted matches'''
+    files = []
+    for pattern in patterns:
+        matches = [pattern]
+        if any(char in pattern for char in "*?["):
+            matches = sorted(glob.glob(pattern))
+            if len(matches) == 0:
+                raise IOError(errno.ENOENT, "no file matches " + pattern)
+        for filename in matches:
+            if filename not in files:
+                files.append(filename)
+    return files
+
+def csv_header(filename):
+    '''column names of a plain or compressed CSV file, or of a columnar file'''
+    if columnar_format(filename) is not None:
+        return ColumnarFile(filename).names()
+    with open_csv(filename) as (csvfile, rawfile):
+        return next(csv.reader([csvfile.readline().decode()]), [])
+
+def load_csv_file(task):
+    '''pool worker: parse one of several input files, caching it on its own'''
+    filename, columns, xaxis_name, rawmode, blockmode, singlepass, useindex, dtypes, cache = task
+    dict_data, x_axis = BigCSVReader().get_csv_data(filename, columns, xaxis_name, 0, 0, rawmode, blockmode,
+                                                    singlepass, 1, useindex, dtypes)
+    if cache is not None and columnar_format(filename) is None:
+        cache.save(filename, columns, xaxis_name, 0, 0, dict_data, x_axis, dtypes)
+    return dict_data, x_axis
+
+def iter_csv_files(files, columns, xaxis_name, rowstart, rowend):
+    '''blocks of several files read one after another, the row window and row numbers running across them'''
+    offset = 0
+    for filename in files:
+        if rowend > 0 and offset >= rowend:
+            break
+        reader = BigCSVReader()
+        for x_axis, block in reader.iter_csv_blocks(filename, columns, xaxis_name, max(rowstart - offset, 0),
+                                                    rowend - offset if rowend > 0 else 0):
+            if reader.idx_xaxis < 0:
+                x_axis = x_axis + offset
+            yield x_axis, block
+        offset += reader.rows_seen
+
+def merge_csv_parts(parts, columns, has_xaxis, rowstart=0, rowend=0):
+    '''one set of columns from the (dict_data, x_axis) of several files, given in file order
+
+    The row window counts rows across the files in that order. Files follow each other by x-axis where
+    their ranges do not overlap, otherwise all rows are merged on the x-axis. Without an x-axis column the
+    rows are numbered in file order. Columns missing from a file are NaN in its rows.
+    '''
+    x_parts = [numpy.asarray(x_axis) for dict_data, x_axis in parts]
+    col_parts = {col: [] for col in columns}
+    for part, x_axis in zip(parts, x_parts):
+        for col in columns:
+            values = part[0][col] if col in part[0] else []
+            if len(values) != len(x_axis):
+                values = numpy.full(len(x_axis), numpy.nan)
+            col_parts[col].append(numpy.asarray(values))
+
+    # cut the row window out of the files it touches
+    first = max(rowstart - 1, 0)
+    offset = 0
+    for i, x_axis in enumerate(x_parts):
+        start = min(max(first - offset, 0), len(x_axis))
+        end = len(x_axis) if rowend <= 0 else min(max(rowend - offset, 0), len(x_axis))
+        offset += len(x_axis)
+        x_parts[i] = x_axis[start:end]
+        for col in columns:
+            col_parts[col][i] = col_parts[col][i][start:end]
+
+    order = [i for i in range(len(x_parts)) if len(x_parts[i]) > 0]
+    merge = False
+    if has_xaxis:
+        ranges = {i: (numpy.nanmin(x_parts[i]), numpy.nanmax(x_parts[i])) for i in order}
+        order.sort(key=lambda i: ranges[i][0])
+        merge = any(ranges[a][1] > ranges[b][0] for a, b in zip(order[:-1], order[1:]))
+
+    x_axis = numpy.concatenate([x_parts[i] for i in order]) if len(order) > 0 else numpy.empty(0)
+    dict_data = {}
+    for col in columns:
+        dict_data[col] = numpy.concatenate([col_parts[col][i] for i in order]) if len(order) > 0 else numpy.empty(0)
+
+    if not has_xaxis:
+        x_axis = numpy.arange(first, first + len(x_axis), dtype=numpy.float64)
+    elif merge:
+        # each file is a sorted run, a stable sort merges the runs k ways and keeps equal x in file order
+        rows = numpy.argsort(x_axis, kind='stable')
+        x_axis = x_axis[rows]
+        for col in columns:
+            dict_data[col] = dict_data[col][rows]
+    return dict_data, x_axis
+
+class ColumnarFile:
+    '''NPZ, Arrow IPC or Parquet file of named columns, read by column and row range without parsing any text
+
+    Uncompressed NPZ members and Arrow IPC files are memory mapped, so the arrays returned are views of the
+    file. Parquet files are read one row group at a time, skipping the groups outside the row range.
+    '''
+    def __init__(self, filename):
+        self.filename = filename
+        self.format = columnar_format(filename)
+        if self.format != "npz":
+            load_pyarrow(filename)
+
+        if self.format == "npz":
+            with zipfile.ZipFile(filename) as archive:
+                self.members = collections.OrderedDict((info.filename[:-4], info) for info in archive.infolist()
+                                                       if info.filename.endswith(".npy"))
+            self.rows = len(self.__npz_column(next(iter(self.members)))) if len(self.members) > 0 else 0
+        elif self.format == "arrow":
+            self.table = pyarrow.ipc.open_file(pyarrow.memory_map(filename)).read_all()
+            self.rows = self.table.num_rows
+        else:
+            self.parquet = pyarrow.parquet.ParquetFile(filename, memory_map=True)
+            self.rows = self.parquet.metadata.num_rows
+
+    def names(self):
+        if self.format == "npz":
+            return list(self.members.keys())
+        if self.format == "arrow":
+            return self.table.column_names
+        return self.parquet.schema_arrow.names
+
+    def __npz_column(self, name):
+        info = self.members[name]
+        if info.compress_type == zipfile.ZIP_STORED:
+            with open(self.filename, 'rb') as f:
+                # the array starts after the local header of the member and the .npy header
+                f.seek(info.header_offset + 26)
+                name_length, extra_length = struct.unpack('<HH', f.read(4))
+                f.seek(info.header_offset + 30 + name_length + extra_length)
+                version = numpy.lib.format.read_magic(f)
+                if version == (1, 0):
+                    shape, fortran_order, dtype = numpy.lib.format.read_array_header_1_0(f)
+                else:
+                    shape, fortran_order, dtype = numpy.lib.format.read_array_header_2_0(f)
+                offset = f.tell()
+            if not dtype.hasobject:
+                return numpy.memmap(self.filename, dtype=dtype, mode='r', offset=offset, shape=shape,
+                                    order='F' if fortran_order else 'C')
+        with numpy.load(self.filename) as archive:
+            return archive[name]
+
+    def __numeric(self, name, values):
+        values = numpy.asarray(values)
+        if values.dtype.kind == "M":
+            # timestamps become seconds since the epoch
+            return values.astype('datetime64[ns]').astype(numpy.int64) / 1e9
+        if values.dtype.kind not in "biuf":
+            raise ValueError("column %s of %s is not numeric" % (name, self.filename))
+        return values
+
+    def __arrow_column(self, table, name):
+        column = table.column(name)
+        if column.num_chunks == 1:
+            # a single chunk without nulls is handed over without a copy
+            return self.__numeric(name, column.chunk(0).to_numpy(zero_copy_only=False))
+        return self.__numeric(name, column.to_numpy())
+
+    def __window(self, rowstart, rowend):
+        first = min(max(rowstart - 1, 0), self.rows)
+        end = self.rows if rowend <= 0 else min(max(rowend, first), self.rows)
+        return first, end
+
+    def __read_rows(self, names, first, end):
+        '''the named columns of rows first to end'''
+        if self.format == "npz":
+            return {name: self.__numeric(name, self.__npz_column(name)[first:end]) for name in names}
+        if self.format == "arrow":
+            table = self.table.select(names).slice(first, end - first)
+            return {name: self.__arrow_column(table, name) for name in names}
+
+        groups = []
+        offset = 0
+        start = 0
+        for i in range(self.parquet.metadata.num_row_groups):
+            rows = self.parquet.metadata.row_group(i).num_rows
+            if offset < end and offset + rows > first:
+                if len(groups) == 0:
+                    start = offset
+                groups.append(i)
+            offset += rows
+        table = self.parquet.read_row_groups(groups, columns=names).slice(first - start, end - first)
+        return {name: self.__arrow_column(table, name) for name in names}
+
+    def __split(self, values, columns, xaxis_name, first, end):
+        '''x-axis and requested columns, rows are numbered from 0 without an x-axis column'''
+        x_axis = values.pop(xaxis_name, None)
+        if x_axis is None:
+            x_axis = numpy.arange(first, end, dtype=numpy.float64)
+        elif xaxis_name in columns:
+            values[xaxis_name] = x_axis
+        return x_axis, values
+
+    def read(self, columns, xaxis_name, rowstart, rowend):
+        '''columns and x-axis of the row window, columns missing from the file are empty'''
+        first, end = self.__window(rowstart, rowend)
+        available = self.names()
+        names = [name for name in available if name in columns or name == xaxis_name]
+        x_axis, dict_data = self.__split(self.__read_rows(names, first, end), columns, xaxis_name, first, end)
+        for col in columns:
+            if col not in dict_data:
+                dict_data[col] = numpy.empty(0)
+        return dict_data, x_axis
+
+    def blocks(self, columns, xaxis_name, rowstart, rowend):
+        '''yield the x-axis and the requested columns of the row window a bounded number of rows at a time'''
+        first, end = self.__window(rowstart, rowend)
+        names = [name for name in self.names() if name in columns or name == xaxis_name]
+        edges = list(range(first, end, COLUMNAR_BLOCK_ROWS)) + [end]
+        if self.format == "parquet":
+            # whole row groups, those are the units Parquet reads
+            edges = [first]
+            offset = 0
+            for i in range(self.parquet.metadata.num_row_groups):
+                offset += self.parquet.metadata.row_group(i).num_rows
+                if first < offset < end:
+                    edges.append(offset)
+            edges.append(end)
+        for start, stop in zip(edges[:-1], edges[1:]):
+            if start < stop:
+                yield self.__split(self.__read_rows(names, start, stop), columns, xaxis_name, start, stop)
+
+def export_columns(filename, dict_data, x_axis, xaxis_name):
+    '''write the x-axis and the columns to an NPZ, Arrow IPC or Parquet file going by its extension'''
+    fileformat = columnar_format(filename)
+    if fileformat is None:
+        raise ValueError("cannot export to %s, use a .npz, .arrow, .feather or .parquet file" % filename)
+    if fileformat != "npz":
+        load_pyarrow(filename, "writing")
+
+    arrays = collections.OrderedDict([(xaxis_name, numpy.asarray(x_axis))])
+    for col in dict_data:
+        if col not in arrays and len(dict_data[col]) == len(x_axis):
+            arrays[col] = numpy.asarray(dict_data[col])
+
+    if fileformat == "npz":
+        # stored uncompressed so the columns can be memory mapped when read back
+        with open(filename, 'wb') as f:
+            numpy.savez(f, **arrays)
+    elif fileformat == "arrow":
+        table = pyarrow.table(arrays)
+        with pyarrow.OSFile(filename, 'wb') as sink, pyarrow.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=COLUMNAR_BLOCK_ROWS)
+    else:
+        pyarrow.parquet.write_table(pyarrow.table(arrays), filename, row_group_size=COLUMNAR_BLOCK_ROWS)
+    return len(arrays)
+
+class SessionColumns(collections.abc.MutableMapping):
+    '''columns of a session file, each memory mapped the first time it is used'''
+    def __init__(self, store, layout, xaxis=None):
+        self.store = store
+        self.layout = layout
+        self.columns = {}
+        # file entries, and so zone maps, of the columns still holding the values stored for them
+        self.entries = dict(layout)
+        self.xaxis = xaxis
+        self.zones = {}
+
+    def __getitem__(self, name):
+        if name not in self.columns:
+            if name not in self.layout:
+                raise KeyError(name)
+            self.columns[name] = self.store.map_column(self.layout[name])
+        return self.columns[name]
+
+    def __setitem__(self, name, values):
+        self.columns[name] = values
+        self.zones.pop(name, None)
+        if self.xaxis is not None and values is self.xaxis[0]:
+            self.entries[name] = self.xaxis[1]
+        else:
+            self.entries.pop(name, None)
+
+    def __delitem__(self, name):
+        if name not in self.columns and name not in self.layout:
+            raise KeyError(name)
+        self.columns.pop(name, None)
+        self.layout.pop(name, None)
+        self.entries.pop(name, None)
+        self.zones.pop(name, None)
+
+    def zone_map(self, name):
+        '''rows per chunk and the per chunk minimum, maximum and NaN flag of a column, None without a zone map'''
+        if name not in self.zones:
+            entry = self.entries.get(name)
+            if entry is None or "zones" not in entry:
+                return None
+            zones = entry["zones"]
+            self.zones[name] = (zones["rows"], self.store.map_column(zones["min"]),
+                                self.store.map_column(zones["max"]), self.store.map_column(zones["nan"]))
+        return self.zones[name]
+
+    def __iter__(self):
+        for name in self.layout:
+            yield name
+        for name in self.columns:
+            if name not in self.layout:
+                yield name
+
+    def __len__(self):
+        return len(self.layout) + sum(1 for name in self.columns if name not in self.layout)
+
+class SessionStore:
+    '''session file with a small JSON header followed by one raw buffer per column in its stored dtype'''
+    def __init__(self, filename=SESSION_FILE):
+        self.filename = filename
+        self.data_start = 0
+
+    def __add_buffer(self, buffers, values):
+        offset = 0
+        if len(buffers) > 0:
+            last, last_values = buffers[-1]
+            offset = last["offset"] + -(-last_values.nbytes // SESSION_ALIGN) * SESSION_ALIGN
+        entry = {"offset": offset, "length": len(values), "dtype": values.dtype.str}
+        buffers.append((entry, values))
+        return entry
+
+    def __add_column(self, buffers, values):
+        '''add the buffers of a column and of its zone map'''
+        # typed columns keep their --dtype, anything else is stored as float64
+        values = numpy.ascontiguousarray(values)
+        if values.dtype.kind not in "if":
+            values = values.astype(numpy.float64)
+        entry = self.__add_buffer(buffers, values)
+        mins, maxs, nans = zone_map(values, ZONE_MAP_ROWS)
+        entry["zones"] = {"rows": ZONE_MAP_ROWS, "min": self.__add_buffer(buffers, mins),
+                          "max": self.__add_buffer(buffers, maxs), "nan": self.__add_buffer(buffers, nans)}
+        return entry
+
+    def save(self, dict_data, x_axis, dict_colors, color_palette):
+        buffers = []
+        layout = {}
+        for name, values in dict_data.items():
+            layout[name] = self.__add_column(buffers, values)
+        xaxis = self.__add_column(buffers, x_axis)
+
+        header = json.dumps({"columns": layout, "xaxis": xaxis,
+                             "colors": dict_colors, "palette": color_palette}).encode()
+        preamble = SESSION_MAGIC + struct.pack("<Q", len(header)) + header
+        data_start = -(-len(preamble) // SESSION_ALIGN) * SESSION_ALIGN
+
+        # viewers may have the old file mapped, replace it rather than rewriting it under them
+        tmpname = "%s.%i.tmp" % (self.filename, os.getpid())
+        try:
+            with open(tmpname, "wb") as f:
+                f.write(preamble)
+                for entry, values in buffers:
+                    f.seek(data_start + entry["offset"])
+                    # straight from the column, without a temporary copy of it
+                    f.write(memoryview(values))
+                last, last_values = buffers[-1]
+                f.truncate(data_start + last["offset"] + -(-last_values.nbytes // SESSION_ALIGN) * SESSION_ALIGN)
+            os.replace(tmpname, self.filename)
+        finally:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+
+    def load(self):
+        '''read the header, returning the lazily mapped columns, x-axis and color assignments'''
+        with open(self.filename, "rb") as f:
+            if f.read(len(SESSION_MAGIC)) != SESSION_MAGIC:
+                raise IOError(0, "not a session file: " + self.filename)
+            header_len = struct.unpack("<Q", f.read(8))[0]
+            header = json.loads(f.read(header_len).decode())
+        self.data_start = -(-(len(SESSION_MAGIC) + 8 + header_len) // SESSION_ALIGN) * SESSION_ALIGN
+
+        dict_colors = {}
+        for name, color in header["colors"].items():
+            dict_colors[name] = tuple(color)
+        color_palette = [tuple(color) for color in header["palette"]]
+        x_axis = self.map_column(header["xaxis"])
+        return (SessionColumns(self, header["columns"], (x_axis, header["xaxis"])), x_axis,
+                dict_colors, color_palette)
+
+    def map_column(self, entry):
+        if entry["length"] == 0:
+            return numpy.empty(0, dtype=entry["dtype"])
+        return numpy.memmap(self.filename, dtype=entry["dtype"], mode='r',
+                            offset=self.data_start + entry["offset"], shape=(entry["length"],))
+
+class SessionCache:
+    '''directory of session files keyed by source file, row window and column set, evicting least recently used'''
+    def __init__(self, cachedir=CACHE_DIR, max_bytes=CACHE_SIZE_MB * 1024 * 1024):
+        self.cachedir = cachedir
+        self.max_bytes = max_bytes
+
+    def __digest(self, *parts):
+        return hashlib.sha1(json.dumps(parts).encode()).hexdigest()[:16]
+
+    def __source_keys(self, filename, xaxis_name, rowstart, rowend, dtypes):
+        '''keys of the source path, of its current contents and of the parse window and column types'''
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        window = [xaxis_name, rowstart, rowend]
+        if dtypes:
+            window.append(sorted(dtypes.items()))
+        return (self.__digest(path), self.__digest(stat.st_size, stat.st_mtime_ns), self.__digest(*window))
+
+    def find(self, filename, columns, xaxis_name, rowstart, rowend, dtypes=None):
+        '''columns and x-axis of a cached load holding at least the requested columns, or None'''
+        path_key, stamp_key, window_key = self.__source_keys(filename, xaxis_name, rowstart, rowend, dtypes)
+        pattern = "%s-%s-%s-*.columns" % (path_key, stamp_key, window_key)
+        for entry in glob.glob(os.path.join(self.cachedir, pattern)):
+            try:
+                dict_data, x_axis, dict_colors, color_palette = SessionStore(entry).load()
+                if all(col in dict_data for col in columns):
+                    # mark as recently used
+                    os.utime(entry)
+                    print("loaded cached session " + entry)
+                    return dict_data, x_axis
+            except (OSError, ValueError, KeyError):
+                continue
+        return None
+
+    def save(self, filename, columns, xaxis_name, rowstart, rowend, dict_data, x_axis, dtypes=None):
+        size = sum(numpy.asarray(values).nbytes for values in list(dict_data.values()) + [x_axis])
+        if size > self.max_bytes:
+            return
+
+        path_key, stamp_key, window_key = self.__source_keys(filename, xaxis_name, rowstart, rowend, dtypes)
+        entry = os.path.join(self.cachedir, "%s-%s-%s-%s.columns" % (
+            path_key, stamp_key, window_key, self.__digest(sorted(columns))))
+        tmpname = "%s.%i.tmp" % (entry, os.getpid())
+        try:
+            os.makedirs(self.cachedir, exist_ok=True)
+            # entries for older contents of the same file can never be used again
+            for stale in glob.glob(os.path.join(self.cachedir, path_key + "-*.columns")):
+                if not os.path.basename(stale).startswith(path_key + "-" + stamp_key):
+                    os.remove(stale)
+
+            SessionStore(tmpname).save(dict_data, x_axis, {}, [])
+            os.replace(tmpname, entry)
+        except OSError as err:
+            print("unable to cache session in {0}: {1}".format(self.cachedir, err.strerror))
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+            return
+
+        self.evict()
+
+    def evict(self):
+        '''remove the least recently used entries until the cache fits its size cap'''
+        entries = []
+        for entry in glob.glob(os.path.join(self.cachedir, "*.columns")):
+            try:
+                stat = os.stat(entry)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        total = sum(size for mtime, size, entry in entries)
+        for mtime, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(entry)
+            except OSError:
+                pass
+            total -= size
+
+class QuantileSketch:
+    '''mergeable sketch of a distribution in logarithmic buckets, each quantile is within a relative error
+    of the true value whatever the number of values added'''
+    def __init__(self, accuracy=SKETCH_ACCURACY):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = numpy.log(self.gamma)
+        self.positive = collections.Counter()
+        self.negative = collections.Counter()
+        self.zeros = 0
+        self.count = 0
+
+    def __count_buckets(self, counter, magnitudes):
+        keys, counts = numpy.unique(numpy.ceil(numpy.log(magnitudes) / self.log_gamma).astype(numpy.int64),
+                                    return_counts=True)
+        counter.update(dict(zip(keys.tolist(), counts.tolist())))
+
+    def add(self, values):
+        '''add an array of finite values'''
+        tiny = numpy.finfo(numpy.float64).tiny
+        positive = values[values > tiny]
+        negative = -values[values < -tiny]
+        self.zeros += len(values) - len(positive) - len(negative)
+        self.count += len(values)
+        if len(positive) > 0:
+            self.__count_buckets(self.positive, positive)
+        if len(negative) > 0:
+            self.__count_buckets(self.negative, negative)
+
+    def __value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return numpy.nan
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self.__value(key)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self.__value(key)
+        return self.__value(max(self.positive))
+
+class ColumnStats:
+    '''count, extremes, mean and variance of a column updated block by block, with a quantile sketch'''
+    def __init__(self):
+        self.count = 0
+        self.missing = 0
+        self.min = numpy.inf
+        self.max = -numpy.inf
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sketch = QuantileSketch()
+
+    def add(self, values):
+        finite = values[numpy.isfinite(values)]
+        self.missing += len(values) - len(finite)
+        n = len(finite)
+        if n == 0:
+            return
+
+        # combine the moments of the block with the running ones (Chan et al.)
+        mean = finite.mean()
+        m2 = numpy.square(finite - mean).sum()
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, float(finite.min()))
+        self.max = max(self.max, float(finite.max()))
+        self.sketch.add(finite)
+
+    def summary(self):
+        summary = {"count": self.count, "missing": self.missing}
+        if self.count == 0:
+            return summary
+        summary.update({"min": self.min, "max": self.max, "mean": float(self.mean),
+                        "std": float(numpy.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else 0.0})
+        for percent in STATS_PERCENTILES:
+            # the sketch may round past the extremes, which are known exactly
+            summary["p%i" % percent] = min(max(self.sketch.quantile(percent / 100.0), self.min), self.max)
+        return summary
+
+class ResampleBuckets:
+    '''count, mean, min and max of each column per fixed width bucket of the x-axis, fed block by block'''
+    def __init__(self, columns, width):
+        self.columns = list(columns)
+        self.width = width
+        # per block reductions, merged once all blocks are in, so memory follows the number of buckets
+        self.parts = []
+
+    def __reduce(self, keys, counts, sums, mins, maxs):
+        '''combine the rows of equal bucket keys'''
+        order = numpy.argsort(keys, kind='stable')
+        keys = keys[order]
+        starts = numpy.flatnonzero(numpy.concatenate(([True], keys[1:] != keys[:-1])))
+        return (keys[starts], numpy.add.reduceat(counts[order], starts), numpy.add.reduceat(sums[order], starts),
+                numpy.minimum.reduceat(mins[order], starts), numpy.maximum.reduceat(maxs[order], starts))
+
+    def add(self, x, columns):
+        valid = numpy.isfinite(x)
+        keys = numpy.floor(x[valid] / self.width).astype(numpy.int64)
+        if len(keys) == 0:
+            return
+        values = numpy.column_stack([columns[col][valid] if col in columns else numpy.full(len(keys), numpy.nan)
+                                     for col in self.columns])
+        finite = numpy.isfinite(values)
+        rows = numpy.ones(len(keys), dtype=numpy.int64)
+        self.parts.append(self.__reduce(keys, numpy.column_stack((rows, finite)), numpy.where(finite, values, 0.0),
+                                        numpy.where(finite, values, numpy.inf),
+                                        numpy.where(finite, values, -numpy.inf)))
+
+    def result(self):
+        '''bucket start, row count and per column count, sum, min and max arrays, ordered by bucket'''
+        if len(self.parts) == 0:
+            empty = numpy.empty((0, len(self.columns)))
+            return numpy.empty(0), numpy.empty(0, dtype=numpy.int64), empty, empty, empty, empty
+        keys, counts, sums, mins, maxs = self.__reduce(*(numpy.concatenate(part) for part in zip(*self.parts)))
+        self.parts = [(keys, counts, sums, mins, maxs)]
+        return keys * self.width, counts[:, 0], counts[:, 1:], sums, mins, maxs
+
+    def write(self, filename):
+        '''write one CSV line per bucket with the row count and the mean, min and max of every column'''
+        starts, rows, counts, sums, mins, maxs = self.result()
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+        empty = counts == 0
+        table = [starts, rows]
+        header = ["x", "count"]
+        for i, col in enumerate(self.columns):
+            table += [means[:, i], numpy.where(empty[:, i], numpy.nan, mins[:, i]),
+                      numpy.where(empty[:, i], numpy.nan, maxs[:, i])]
+            header += [col + "_mean", col + "_min", col + "_max"]
+        numpy.savetxt(filename, numpy.column_stack(table), fmt="%.10g", delimiter=",", header=",".join(header),
+                      comments="")
+        return len(starts)
+
+def summarize_data(blocks, columns, width=0):
+    '''column statistics and, with a bucket width, the resampled columns of a stream of x-axis and column blocks'''
+    stats = collections.OrderedDict((col, ColumnStats()) for col in columns)
+    resample = ResampleBuckets(columns, width) if width > 0 else None
+    for x, block in blocks:
+        for col, values in block.items():
+            if col in stats:
+                stats[col].add(values)
+        if resample is not None:
+            resample.add(x, block)
+    return stats, resample
+
+def report_stats(stats, jsonfile=""):
+    '''print a table of the column statistics, or write them as JSON'''
+    summary = collections.OrderedDict((col, column.summary()) for col, column in stats.items())
+    if len(jsonfile) > 0:
+        with open(jsonfile, 'w') as f:
+            json.dump(summary, f, indent=1)
+        print("statistics written to " + jsonfile)
+        return
+
+    fields = ["count", "missing", "min", "max", "mean", "std"] + ["p%i" % percent for percent in STATS_PERCENTILES]
+    print("%-16s" % "column" + "".join("%14s" % field for field in fields))
+    for col, values in summary.items():
+        print("%-16s" % col + "".join("%14.6g" % values[field] if field in values else "%14s" % "-"
+                                      for field in fields))
+
+def decimate_minmax(x, y, min_x, max_x, width):
+    '''reduce a line sorted by x to the first, min, max and last point of each pixel column in [min_x, max_x]
+
+    Every spike survives since each pixel column keeps its extremes. One point on either side of the range is
+    kept so the line runs off the edges of the view.
+    '''
+    width = max(int(width), 1)
+    first = max(numpy.searchsorted(x, min_x, 'left') - 1, 0)
+    last = min(numpy.searchsorted(x, max_x, 'right') + 1, len(x))
+    if last - first <= 4 * width:
+        return x[first:last], y[first:last]
+
+    # bucket edges in index space, empty pixel columns are dropped
+    edges = numpy.searchsorted(x, numpy.linspace(min_x, max_x, width + 1)[1:-1]).clip(first, last)
+    edges = numpy.unique(numpy.concatenate(([first], edges, [last])))
+    starts = edges[:-1]
+    ends = edges[1:] - 1
+    ys = y[:last]
+
+    x_first = x[starts]
+    x_last = x[ends]
+    x_mid = (x_first + x_last) / 2
+    xs = numpy.column_stack((x_first, x_mid, x_mid, x_last)).ravel()
+    # fmin and fmax skip NaN, a gap in the data must not hide a spike in the same pixel column
+    ys = numpy.column_stack((y[starts], numpy.fmin.reduceat(ys, starts), numpy.fmax.reduceat(ys, starts),
+                             y[ends])).ravel()
+    return xs, ys
+
+class StreamEnvelopes:
+    '''first, min, max and last sample of each line per bucket of the x-axis, folded in block by block
+
+    The first block sets buckets of 1/budget of its x range. Whenever the x range seen so far outgrows the
+    budget the bucket width doubles and neighbouring buckets merge, so memory follows the budget, not the file.
+    Min and max are exact for any x-axis, first and last are the first and last samples of an ordered one.
+    '''
+    def __init__(self, columns, budget):
+        self.columns = list(columns)
+        self.budget = max(int(budget), 2)
+        self.origin = None
+        self.width = None
+        self.rows = 0
+        self.parts = None
+
+    def __reduce(self, keys, x_first, x_last, firsts, lasts, mins, maxs):
+        '''combine the entries of equal bucket keys, earlier entries first'''
+        order = numpy.argsort(keys, kind='stable')
+        keys = keys[order]
+        starts = numpy.flatnonzero(numpy.concatenate(([True], keys[1:] != keys[:-1])))
+        first = order[starts]
+        last = order[numpy.concatenate((starts[1:], [len(keys)])) - 1]
+        return (keys[starts], x_first[first], x_last[last], firsts[first], lasts[last],
+                numpy.fmin.reduceat(mins[order], starts), numpy.fmax.reduceat(maxs[order], starts))
+
+    def add(self, x, columns):
+        valid = numpy.isfinite(x)
+        x = x[valid]
+        if len(x) == 0:
+            return
+        self.rows += len(x)
+        values = numpy.column_stack([numpy.asarray(columns[col], dtype=numpy.float64)[valid] if col in columns
+                                     else numpy.full(len(x), numpy.nan) for col in self.columns])
+        if self.origin is None:
+            self.origin = x.min()
+            spread = x.max() - self.origin
+            self.width = spread / self.budget if spread > 0 else max(abs(self.origin), 1.0) * 1e-9
+
+        # double the bucket width until the buckets of the old and the new rows fit the budget
+        low = numpy.floor((x.min() - self.origin) / self.width)
+        high = numpy.floor((x.max() - self.origin) / self.width)
+        if self.parts is not None:
+            low = min(low, self.parts[0][0])
+            high = max(high, self.parts[0][-1])
+        shift = 0
+        while numpy.floor(high / 2 ** shift) - numpy.floor(low / 2 ** shift) >= self.budget:
+            shift += 1
+        self.width *= 2 ** shift
+
+        keys = numpy.floor((x - self.origin) / self.width).astype(numpy.int64)
+        parts = (keys, x, x, values, values, values, values)
+        if self.parts is not None:
+            old = (self.parts[0] >> shift,) + self.parts[1:]
+            parts = tuple(numpy.concatenate(pair) for pair in zip(old, parts))
+        self.parts = self.__reduce(*parts)
+
+    def limits(self):
+        '''x and y range of the rows folded in so far'''
+        if self.parts is None:
+            return [float('inf'), float('-inf'), float('inf'), float('-inf')]
+        keys, x_first, x_last, firsts, lasts, mins, maxs = self.parts
+        with warnings.catch_warnings():
+            # columns without a single value have no range
+            warnings.simplefilter('ignore', RuntimeWarning)
+            min_y = numpy.nanmin(mins) if mins.size > 0 else float('inf')
+            max_y = numpy.nanmax(maxs) if maxs.size > 0 else float('-inf')
+        return [min(x_first.min(), x_last.min()), max(x_first.max(), x_last.max()), min_y, max_y]
+
+    def lines(self):
+        '''x-axis and per column y arrays of the envelopes, four points per bucket as drawn by decimate_minmax'''
+        if self.parts is None:
+            return numpy.empty(0), {col: numpy.empty(0) for col in self.columns}
+        keys, x_first, x_last, firsts, lasts, mins, maxs = self.parts
+        x_mid = (x_first + x_last) / 2
+        xs = numpy.column_stack((x_first, x_mid, x_mid, x_last)).ravel()
+        ys = {}
+        for i, col in enumerate(self.columns):
+            ys[col] = numpy.column_stack((firsts[:, i], mins[:, i], maxs[:, i], lasts[:, i])).ravel()
+        return xs, ys
+
+class WindowCache:
+    '''least recently used windows of rows, loaded on demand or ahead of time by a background thread'''
+    def __init__(self, load, size=PAGE_CACHE_WINDOWS):
+        self.load = load
+        self.size = size
+        self.windows = collections.OrderedDict()
+        self.wanted = []
+        self.loading = None
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.__prefetch, daemon=True)
+        self.thread.start()
+
+    def __store(self, key, window):
+        self.windows[key] = window
+        self.windows.move_to_end(key)
+        while len(self.windows) > self.size:
+            self.windows.popitem(last=False)
+
+    def put(self, key, window):
+        with self.condition:
+            self.__store(key, window)
+
+    def get(self, key):
+        '''the window of key, waiting for the background thread if it is loading it, or loading it here'''
+        with self.condition:
+            while self.loading == key:
+                self.condition.wait()
+            if key in self.windows:
+                self.windows.move_to_end(key)
+                return self.windows[key]
+        window = self.load(*key)
+        self.put(key, window)
+        return window
+
+    def prefetch(self, keys):
+        '''replace the windows waiting to be loaded in the background'''
+        with self.condition:
+            self.wanted = [key for key in keys if key not in self.windows]
+            self.condition.notify_all()
+
+    def __prefetch(self):
+        while True:
+            with self.condition:
+                while len(self.wanted) == 0:
+                    self.condition.wait()
+                key = self.wanted.pop(0)
+                if key in self.windows:
+                    continue
+                self.loading = key
+            try:
+                window = self.load(*key)
+            except (IOError, ValueError):
+                # shown as an error once the window is asked for
+                window = None
+            with self.condition:
+                self.loading = None
+                if window is not None:
+                    self.__store(key, window)
+                self.condition.notify_all()
+
+FILTER_TOKEN = re.compile(r'''\s*(?:(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)|(?P<quoted>"[^"]*"|'[^']*'|`[^`]*`)|(?P<name>[A-Za-z_][\w.]*)|(?P<op>>=|<=|==|!=|<>|[-+*/%<>=()\[\],&|~!]))''')
+FILTER_COMPARE = {
+    ">": numpy.greater, ">=": numpy.greater_equal, "<": numpy.less, "<=": numpy.less_equal,
+    "=": numpy.equal, "==": numpy.equal, "!=": numpy.not_equal, "<>": numpy.not_equal,
+}
+FILTER_ARITHMETIC = {
+    "+": numpy.add, "-": numpy.subtract, "*": numpy.multiply, "/": numpy.true_divide, "%": numpy.mod,
+}
+# calls accepted for compatibility with filters written as numpy code, all of them pass their argument through
+FILTER_PASSTHROUGH = ("numpy.where", "numpy.array", "numpy.asarray")
+
+class FilterExpression:
+    '''pseudo-SQL "SELECT cols WHERE expression" filter, parsed once into a tree evaluated with numpy
+
+    The expression supports comparisons, AND/OR/NOT (or &, |, ~), parentheses and arithmetic between
+    columns and numbers. Column names that are not plain identifiers can be quoted with double quotes.
+    '''
+    def __init__(self, text):
+        self.text = text
+        self.select = []
+        self.columns = set()
+        self.tokens = self.__tokenize(text)
+        self.pos = 0
+        self.last = None
+
+        if self.__keyword("SELECT"):
+            self.select = self.__parse_select()
+            if not self.__keyword("WHERE"):
+                self.__error("expected WHERE")
+        self.tree = self.__parse_or()
+        if self.pos < len(self.tokens):
+            self.__error("unexpected '%s'" % self.tokens[self.pos][1])
+        self.tokens = None
+
+    def __error(self, message):
+        raise ValueError("filter \"%s\": %s" % (self.text, message))
+
+    def __tokenize(self, text):
+        tokens = []
+        pos = 0
+        text = text.rstrip()
+        while pos < len(text):
+            match = FILTER_TOKEN.match(text, pos)
+            if match is None:
+                self.__error("cannot parse '%s'" % text[pos:].strip())
+            tokens.append((match.lastgroup, match.group(match.lastgroup)))
+            pos = match.end()
+        return tokens
+
+    def __peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return (None, None)
+
+    def __next(self):
+        token = self.__peek()
+        if token[0] is None:
+            self.__error("unexpected end of expression")
+        self.pos += 1
+        return token
+
+    def __keyword(self, word):
+        kind, value = self.__peek()
+        if kind == "name" and value.upper() == word:
+            self.pos += 1
+            return True
+        return False
+
+    def __op(self, *ops):
+        kind, value = self.__peek()
+        if kind == "op" and value in ops:
+            self.pos += 1
+            return value
+        return None
+
+    def __expect(self, op):
+        if self.__op(op) is None:
+            self.__error("expected '%s'" % op)
+
+    def __parse_select(self):
+        if self.__op("*"):
+            return ["*"]
+        select = [self.__parse_name()]
+        while self.__op(","):
+            select.append(self.__parse_name())
+        return select
+
+    def __parse_name(self):
+        kind, value = self.__next()
+        if kind == "quoted":
+            return value[1:-1]
+        if kind != "name":
+            self.__error("expected a column name, found '%s'" % value)
+        return value
+
+    def __parse_or(self):
+        node = self.__parse_and()
+        while self.__keyword("OR") or self.__op("|"):
+            node = ("or", node, self.__parse_and())
+        return node
+
+    def __parse_and(self):
+        node = self.__parse_not()
+        while self.__keyword("AND") or self.__op("&"):
+            node = ("and", node, self.__parse_not())
+        return node
+
+    def __parse_not(self):
+        if self.__keyword("NOT") or self.__op("~", "!"):
+            return ("not", self.__parse_not())
+        return self.__parse_compare()
+
+    def __parse_compare(self):
+        node = self.__parse_sum()
+        op = self.__op(*FILTER_COMPARE.keys())
+        if op is not None:
+            node = ("compare", op, node, self.__parse_sum())
+        return node
+
+    def __parse_sum(self):
+        node = self.__parse_term()
+        op = self.__op("+", "-")
+        while op is not None:
+            node = ("arithmetic", op, node, self.__parse_term())
+            op = self.__op("+", "-")
+        return node
+
+    def __parse_term(self):
+        node = self.__parse_unary()
+        op = self.__op("*", "/", "%")
+        while op is not None:
+            node = ("arithmetic", op, node, self.__parse_unary())
+            op = self.__op("*", "/", "%")
+        return node
+
+    def __parse_unary(self):
+        op = self.__op("-", "+")
+        if op == "-":
+            return ("negate", self.__parse_unary())
+        if op == "+":
+            return self.__parse_unary()
+        return self.__parse_atom()
+
+    def __parse_atom(self):
+        kind, value = self.__next()
+        if kind == "number":
+            return ("number", float(value))
+        if kind == "op" and value == "(":
+            node = self.__parse_or()
+            self.__expect(")")
+            return node
+        if kind == "quoted":
+            return self.__column(value[1:-1])
+        if kind == "name":
+            if value in FILTER_PASSTHROUGH and self.__op("("):
+                node = self.__parse_or()
+                self.__expect(")")
+                return node
+            if value == "abs" and self.__op("("):
+                node = ("abs", self.__parse_or())
+                self.__expect(")")
+                return node
+            if value == "dict_data" and self.__op("["):
+                kind, name = self.__next()
+                if kind != "quoted":
+                    self.__error("expected a quoted column name after dict_data[")
+                self.__expect("]")
+                return self.__column(name[1:-1])
+            return self.__column(value)
+        self.__error("unexpected '%s'" % value)
+
+    def __column(self, name):
+        self.columns.add(name)
+        return ("column", name)
+
+    def __evaluate(self, node, arrays):
+        kind = node[0]
+        if kind == "column":
+            return arrays[node[1]]
+        if kind == "number":
+            return node[1]
+        if kind == "compare":
+            return FILTER_COMPARE[node[1]](self.__evaluate(node[2], arrays), self.__evaluate(node[3], arrays))
+        if kind == "arithmetic":
+            return FILTER_ARITHMETIC[node[1]](self.__evaluate(node[2], arrays), self.__evaluate(node[3], arrays))
+        if kind == "negate":
+            return numpy.negative(self.__evaluate(node[1], arrays))
+        if kind == "abs":
+            return numpy.absolute(self.__evaluate(node[1], arrays))
+        if kind == "not":
+            return numpy.logical_not(self.__evaluate(node[1], arrays))
+
+        left = self.__evaluate(node[1], arrays)
+        right = self.__evaluate(node[2], arrays)
+        # results of the operands are temporaries unless they are bare columns, so combine in place
+        out = None
+        if node[1][0] not in ("column", "number") and isinstance(left, numpy.ndarray) and left.dtype == bool:
+            out = left
+        if kind == "and":
+            return numpy.logical_and(left, right, out=out)
+        return numpy.logical_or(left, right, out=out)
+
+    def __interval(self, node, zones):
+        '''per chunk lower and upper bound and NaN flag of a numeric expression, from the column zone maps'''
+        kind = node[0]
+        if kind == "column":
+            return zones[node[1]]
+        if kind == "number":
+            return node[1], node[1], False
+        if kind == "negate":
+            lo, hi, nan = self.__interval(node[1], zones)
+            return numpy.negative(hi), numpy.negative(lo), nan
+        if kind == "abs":
+            lo, hi, nan = self.__interval(node[1], zones)
+            low = numpy.where(lo > 0, lo, numpy.where(hi < 0, numpy.negative(hi), 0.0))
+            return low, numpy.maximum(numpy.absolute(lo), numpy.absolute(hi)), nan
+        if kind == "arithmetic":
+            lo1, hi1, nan1 = self.__interval(node[2], zones)
+            lo2, hi2, nan2 = self.__interval(node[3], zones)
+            nan = numpy.logical_or(nan1, nan2)
+            with numpy.errstate(all='ignore'):
+                if node[1] == "+":
+                    lo, hi = numpy.add(lo1, lo2), numpy.add(hi1, hi2)
+                elif node[1] == "-":
+                    lo, hi = numpy.subtract(lo1, hi2), numpy.subtract(hi1, lo2)
+                elif node[1] == "*" or node[1] == "/":
+                    ends = [FILTER_ARITHMETIC[node[1]](a, b) for a in (lo1, hi1) for b in (lo2, hi2)]
+                    lo = numpy.minimum.reduce([numpy.where(numpy.isnan(end), -numpy.inf, end) for end in ends])
+                    hi = numpy.maximum.reduce([numpy.where(numpy.isnan(end), numpy.inf, end) for end in ends])
+                    if node[1] == "/":
+                        # a divisor range holding zero bounds nothing
+                        zero = numpy.logical_and(lo2 <= 0, hi2 >= 0)
+                        lo = numpy.where(zero, -numpy.inf, lo)
+                        hi = numpy.where(zero, numpy.inf, hi)
+                        nan = numpy.logical_or(nan, zero)
+                else:
+                    return -numpy.inf, numpy.inf, True
+            return numpy.where(numpy.isnan(lo), -numpy.inf, lo), numpy.where(numpy.isnan(hi), numpy.inf, hi), nan
+
+        # a condition used as a number is 0 or 1
+        maybe_true, maybe_false = self.__condition(node, zones)
+        return numpy.where(maybe_false, 0.0, 1.0), numpy.where(maybe_true, 1.0, 0.0), False
+
+    def __condition(self, node, zones):
+        '''per chunk flags whether any row may match and whether any row may not match'''
+        kind = node[0]
+        if kind == "and" or kind == "or":
+            true1, false1 = self.__condition(node[1], zones)
+            true2, false2 = self.__condition(node[2], zones)
+            if kind == "and":
+                return numpy.logical_and(true1, true2), numpy.logical_or(false1, false2)
+            return numpy.logical_or(true1, true2), numpy.logical_and(false1, false2)
+        if kind == "not":
+            maybe_true, maybe_false = self.__condition(node[1], zones)
+            return maybe_false, maybe_true
+
+        if kind != "compare":
+            # a number used as a condition is true unless zero, NaN included
+            lo, hi, nan = self.__interval(node, zones)
+            return numpy.logical_or(numpy.logical_or(lo != 0, hi != 0), nan), numpy.logical_and(lo <= 0, hi >= 0)
+
+        lo1, hi1, nan1 = self.__widen(*self.__interval(node[2], zones))
+        lo2, hi2, nan2 = self.__widen(*self.__interval(node[3], zones))
+        # comparisons with NaN are false, except for not equal
+        nan = numpy.logical_or(nan1, nan2)
+        op = node[1]
+        if op == ">":
+            return hi1 > lo2, numpy.logical_or(lo1 <= hi2, nan)
+        if op == ">=":
+            return hi1 >= lo2, numpy.logical_or(lo1 < hi2, nan)
+        if op == "<":
+            return lo1 < hi2, numpy.logical_or(hi1 >= lo2, nan)
+        if op == "<=":
+            return lo1 <= hi2, numpy.logical_or(hi1 > lo2, nan)
+        overlap = numpy.logical_and(lo1 <= hi2, lo2 <= hi1)
+        unequal = numpy.logical_not(numpy.logical_and(numpy.logical_and(lo1 == hi1, lo2 == hi2), lo1 == lo2))
+        if op in ("!=", "<>"):
+            return numpy.logical_or(unequal, nan), overlap
+        return overlap, numpy.logical_or(unequal, nan)
+
+    def __widen(self, lo, hi, nan):
+        '''pad the bounds by a little more than the rounding of float32 columns and arithmetic'''
+        lo = numpy.asarray(lo, dtype=numpy.float64)
+        hi = numpy.asarray(hi, dtype=numpy.float64)
+        with numpy.errstate(all='ignore'):
+            lo = numpy.where(numpy.isfinite(lo), lo - numpy.absolute(lo) * 1e-6 - 1e-300, lo)
+            hi = numpy.where(numpy.isfinite(hi), hi + numpy.absolute(hi) * 1e-6 + 1e-300, hi)
+        return lo, hi, nan
+
+    def __candidate_chunks(self, dict_data, length):
+        '''rows per chunk and the flags of the chunks that may hold matching rows, None without zone maps'''
+        zone_map = getattr(dict_data, "zone_map", None)
+        if zone_map is None or len(self.columns) == 0:
+            return None
+        rows = None
+        zones = {}
+        for name in self.columns:
+            zone = zone_map(name)
+            if zone is None or (rows is not None and zone[0] != rows) or len(zone[1]) != -(-length // zone[0]):
+                return None
+            rows = zone[0]
+            zones[name] = zone[1:]
+        maybe_true, maybe_false = self.__condition(self.tree, zones)
+        return rows, numpy.broadcast_to(maybe_true, (-(-length // rows),))
+
+    def __prepare(self, values):
+        # float32 columns compare in their own precision, integers are widened so arithmetic cannot overflow
+        if values.dtype.kind != "f":
+            return values.astype(numpy.float64)
+        return values
+
+    def evaluate(self, dict_data, length):
+        '''boolean mask of the rows matching the expression'''
+        for name in self.columns:
+            if name not in dict_data:
+                self.__error("unknown column '%s'" % name)
+
+        # every referenced column is looked up once, without copying it
+        key = tuple(dict_data[name] for name in sorted(self.columns))
+        if self.last is not None and len(self.last[0]) == len(key) and \
+                all(a is b for a, b in zip(self.last[0], key)) and len(self.last[1]) == length:
+            return self.last[1]
+
+        arrays = {}
+        for name, values in zip(sorted(self.columns), key):
+            arrays[name] = numpy.asarray(values)
+
+        chunks = self.__candidate_chunks(dict_data, length)
+        if chunks is None or chunks[1].all():
+            mask = self.__evaluate(self.tree, {name: self.__prepare(values) for name, values in arrays.items()})
+            mask = numpy.asarray(mask, dtype=bool)
+            if mask.ndim == 0:
+                mask = numpy.full(length, bool(mask))
+        else:
+            # the zone maps rule out every other chunk, evaluate runs of candidate chunks on views of the columns
+            rows, candidates = chunks
+            mask = numpy.zeros(length, dtype=bool)
+            edges = numpy.flatnonzero(numpy.diff(numpy.concatenate(([0], candidates.astype(numpy.int8), [0]))))
+            for first, last in zip(edges[::2], edges[1::2]):
+                start = first * rows
+                end = min(last * rows, length)
+                part = {name: self.__prepare(values[start:end]) for name, values in arrays.items()}
+                mask[start:end] = self.__evaluate(self.tree, part)
+
+        self.last = (key, mask)
+        return mask
+
+@functools.lru_cache(maxsize=64)
+def compile_filter(text):
+    '''parsed filter expression, reused for repeated evaluations of the same text'''
+    return FilterExpression(text)
+
 class CSVAnalyzer:
-    def __init__(self, columns, xaxis_label, yaxis_label, colorbyplot, scatterplot, hidelegend, pngfile):
+    def __init__(self, columns, xaxis_label, yaxis_label, colorbyplot, scatterplot, hidelegend, pngfile,
+                 exactlines=False, density=False):
         self.line_cnt = 0
         self.legend_keys = []
         self.color_palette = []
@@ -117,160 +2261,358 @@ class CSVAnalyzer:
         self.yaxis_label = yaxis_label
         self.hidelegend = hidelegend
         self.pngfile = pngfile
+        self.exactlines = exactlines
+        self.density = density
 
         self.figure_1 = None
         self.axis_1 = None
-
-    def load_data(self, filename, rowstart, rowend, restore_pickle, rawreadmode=False):
+        self.highlight_spans = None
+        self.highlight_collection = None
+        self.highlight_expression = None
+        self.lod_update = None
+        self.data_limits = None
+        self.fitted_limits = None
+        self.follow_reader = None
+        self.follow_interval = 0
+        self.follow_timer = None
+        self.follow_envelopes = None
+        self.follow_folded = 0
+        self.page_source = None
+        self.page_window = None
+        self.page_cache = None
+        self.page_options = None
+        self.page_width = 0
+        self.title = ""
+
+    def load_data(self, filename, rowstart, rowend, restore_pickle, rawreadmode=False, blockreadmode=False,
+                  singlepass=False, jobs=1, useindex=True, cache=None, follow=0, dtypes=None):
         if restore_pickle:
-            self.restore_data()
+            with profile_stage("session restore"):
+                self.restore_data()
+            return
+
+        if isinstance(filename, list):
+            if follow > 0:
+                print("--follow is not supported for several files, loading them once")
+            self.__load_files(filename, rowstart, rowend, rawreadmode, blockreadmode, singlepass, jobs, useindex,
+                              cache, dtypes)
+            return
+
+        if columnar_format(filename) is not None:
+            # columnar files are read without parsing, there is nothing worth caching or following
+            cache = None
+            if follow > 0:
+                print("--follow is only supported for CSV files, loading %s once" % filename)
+                follow = 0
+
+        if follow > 0 and csv_codec(filename) is not None:
+            # appended bytes of a compressed stream cannot be decoded on their own
+            print("--follow is not supported for compressed files, loading %s once" % filename)
+            follow = 0
+
+        if follow > 0:
+            # keep the reader to parse whatever gets appended to the file later
+            self.follow_reader = BigCSVReader()
+            self.follow_interval = follow
+            self.dict_data, self.x_axis = self.follow_reader.follow_csv_data(
+                filename, self.columns_plot, self.xaxis_label, rowstart, rowend, dtypes)
+            return
+
+        cached = None
+        if cache is not None:
+            with profile_stage("cache lookup"):
+                cached = cache.find(filename, self.columns_plot, self.xaxis_label, rowstart, rowend, dtypes)
+
+        if cached is not None:
+            self.dict_data, self.x_axis = cached
         else:
-            self.dict_data, self.x_axis = self.get_csv_data(
-                filename, self.columns_plot, self.xaxis_label, rowstart, rowend, rawreadmode)
+            with profile_stage("parse"):
+                self.dict_data, self.x_axis = self.get_csv_data(
+                    filename, self.columns_plot, self.xaxis_label, rowstart, rowend, rawreadmode, blockreadmode,
+                    singlepass, jobs, useindex, dtypes)
+            if PROFILER is not None:
+                profile_count("parse", len(self.x_axis), os.path.getsize(filename))
+            if cache is not None:
+                with profile_stage("cache save"):
+                    cache.save(filename, self.columns_plot, self.xaxis_label, rowstart, rowend,
+                               self.dict_data, self.x_axis, dtypes)
+
+    def __load_files(self, files, rowstart, rowend, rawreadmode, blockreadmode, singlepass, jobs, useindex, cache,
+                     dtypes):
+        '''parse several files in a process pool, each cached on its own, and merge them into one set of columns'''
+        parts = [None] * len(files)
+        if cache is not None:
+            with profile_stage("cache lookup"):
+                for i, filename in enumerate(files):
+                    parts[i] = cache.find(filename, self.columns_plot, self.xaxis_label, 0, 0, dtypes)
+
+        missing = [i for i, part in enumerate(parts) if part is None]
+        if len(missing) > 0:
+            workers = min(len(missing), jobs if jobs > 1 else os.cpu_count() or 1)
+            print("parsing %i of %i files in %i processes" % (len(missing), len(files), workers))
+            tasks = [(files[i], self.columns_plot, self.xaxis_label, rawreadmode, blockreadmode, singlepass,
+                      useindex, dtypes, cache) for i in missing]
+            with profile_stage("parse"):
+                if workers > 1:
+                    with multiprocessing.Pool(workers) as pool:
+                        results = pool.map(load_csv_file, tasks, chunksize=1)
+                else:
+                    results = [load_csv_file(task) for task in tasks]
+            for i, result in zip(missing, results):
+                parts[i] = result
+            if PROFILER is not None:
+                profile_count("parse", sum(len(parts[i][1]) for i in missing),
+                              sum(os.path.getsize(files[i]) for i in missing))
+
+        with profile_stage("merge"):
+            has_xaxis = all(self.xaxis_label in csv_header(filename) for filename in files)
+            self.dict_data, self.x_axis = merge_csv_parts(parts, self.columns_plot, has_xaxis, rowstart, rowend)
 
     def get_data(self):
         return self.dict_data, self.x_axis
             
     def plot(self, title, filterstring):
-        highlight_region = []
+        self.title = title
+        load_matplotlib(self.pngfile is not None and len(self.pngfile) > 0)
+        highlight_spans = None
         highlight_lines = []
 
         for header in self.columns_plot:
             self.dict_lines[header] = None
             self.dict_colors[header] = ("black", 1)
 
-        self.__assign_colors(self.dict_colors)
+        with profile_stage("assign colors"):
+            self.__assign_colors(self.dict_colors)
 
         # filtering expression and highlighting plot
         if len(filterstring) > 0:
-            self.dict_data[self.xaxis_label] = self.x_axis
-            # find the WHERE
-            qry = str(filterstring)
-            qrys = qry.split("WHERE")
-            if len(qrys) == 2:
-                plot_list_str = qrys[0]
-
-                plot_list_str = plot_list_str.replace("SELECT", "")
-                plots = plot_list_str.replace(" ", "").split(",")
-                if len(plots) > 0 and plots[0] != "*":
-                    for plot in plots:
-                        highlight_lines.append(plot)
-                elif len(plots) == 1 and plots[0] == "*":
-                    highlight_lines = plots
-
-                tokens = qrys[1].split(' ')
-                replacements = {}
-
-                # build up the array query
-                for key_name in self.dict_data.keys():
-                    found_idx = 0
-                    for token in tokens:
-                        if token == key_name:
-                            replacements[found_idx] = "numpy.array(dict_data[\"" + key_name + "\"])"
-                        found_idx += 1
-
-                filter_expression = ""
-                for replacement in replacements:
-                    tokens[replacement] = replacements[replacement]
-
-                for token in tokens:
-                    filter_expression += token + " "
-
-                tokens = filter_expression.split("AND")
-                if len(tokens) > 1:
-                    filter_expression = ""
-                    for token_idx in range(len(tokens)):
-                        filter_expression += "(" + tokens[token_idx] + ") "
-                        if token_idx < len(tokens) - 1:
-                            filter_expression += " & "
-
-                tokens = filter_expression.split("OR")
-                if len(tokens) > 1:
-                    filter_expression = ""
-                    for token_idx in range(len(tokens)):
-                        filter_expression += "(" + tokens[token_idx]+ ") "
-                        if token_idx < len(tokens) - 1:
-                            filter_expression += " | "
-
-                exe_str = "res = numpy.where(" + filter_expression + ")"
-            else:
-                exe_str = "res = " + filterstring
-
-            ldict = {}
-            gdict = globals()
-            gdict["dict_data"] = self.dict_data
-            exec(exe_str, gdict, ldict)
-
-            # hightlight the selected data range(s)
-            if len(ldict["res"]) > 0:
-                arr = ldict["res"][0]
-                last_idx = -2
-                min_x = numpy.amin(self.x_axis)
-                max_x = min_x
-                highlighted = False
-                for idx in arr:
-                    if last_idx != idx - 1:
-                        if min_x != max_x:
-                            highlight_region.append((min_x, max_x))
-                            highlighted = True
-                        min_x = self.x_axis[idx]
-                    max_x = self.x_axis[idx]
-                    last_idx = idx
-
-                if not highlighted and min_x != max_x:
-                    highlight_region.append((min_x, max_x))
+            with profile_stage("filter"):
+                self.dict_data[self.xaxis_label] = self.x_axis
+                expression = compile_filter(str(filterstring))
+                self.highlight_expression = expression
+                highlight_lines = list(expression.select)
+                # hightlight the selected data range(s)
+                highlight_spans = self.__find_spans(expression.evaluate(self.dict_data, len(self.x_axis)))
+            profile_count("filter", len(self.x_axis))
 
         # fill the plot lines with the data
         figure_1 = plotter.figure(1)
         if len(title) > 0:
             figure_1.suptitle(title)
         self.axis_1 = figure_1.add_subplot(1, 1, 1)
-        self.__create_lines(self.axis_1, self.dict_lines, self.dict_colors, highlight_lines)
-        if self.__fill_lines(self.dict_lines, self.dict_data):
-            self.__fit_plot(self.axis_1, self.dict_lines, self.dict_data)
-            plotter.subplots_adjust(left=0.08, right=0.97, top=0.94, bottom=0.1)
-            legend_values = []
-            for key in self.legend_keys:
-                legend_values.append(self.dict_lines[key])
-            
-            if not self.hidelegend:
-                self.axis_1.legend(legend_values, self.legend_keys)
+        with profile_stage("create lines"):
+            self.__create_lines(self.axis_1, self.dict_lines, self.dict_colors, highlight_lines)
+            filled = self.__fill_lines(self.dict_lines, self.dict_data)
+        if filled:
+            with profile_stage("fit plot"):
+                self.__fit_plot(self.axis_1, self.dict_lines, self.dict_data)
+            with profile_stage("decimate"):
+                self.__decimate_lines(figure_1, self.axis_1)
+            if self.scatter and self.density:
+                with profile_stage("density"):
+                    self.__draw_density(self.axis_1, self.dict_data)
+            self.__add_legend(self.axis_1)
+
+        if highlight_spans is not None:
+            with profile_stage("highlights"):
+                self.__draw_highlights(self.axis_1, highlight_spans)
+
+        self.__show(figure_1)
+
+    def plot_stream(self, filename, rowstart, rowend, title, filterstring):
+        '''plot a CSV file, or a list of them, of any size in one pass, folding each block of rows into per-pixel envelopes
+
+        Only the envelopes, the data limits and the merged highlight spans are kept, so memory follows the
+        block size and the plot width instead of the file size. Zooming in shows the envelopes, not the samples.
+        '''
+        if self.scatter:
+            raise ValueError("--stream draws timeseries lines, not scatter plots")
+        load_matplotlib(self.pngfile is not None and len(self.pngfile) > 0)
+        expression = None
+        highlight_lines = []
+        columns = list(self.columns_plot)
+
+        for header in self.columns_plot:
+            self.dict_lines[header] = None
+            self.dict_colors[header] = ("black", 1)
+
+        with profile_stage("assign colors"):
+            self.__assign_colors(self.dict_colors)
 
-        for region in highlight_region:
-            plotter.axvspan(region[0], region[1], color='orange', alpha=0.5)
+        if len(filterstring) > 0:
+            expression = compile_filter(str(filterstring))
+            highlight_lines = list(expression.select)
+            # columns only used by the filter are parsed but not drawn
+            columns += [name for name in sorted(expression.columns)
+                        if name not in columns and name != self.xaxis_label]
 
+        figure_1 = plotter.figure(1)
+        if len(title) > 0:
+            figure_1.suptitle(title)
+        self.axis_1 = figure_1.add_subplot(1, 1, 1)
+        with profile_stage("create lines"):
+            self.__create_lines(self.axis_1, self.dict_lines, self.dict_colors, highlight_lines)
+        self.__add_legend(self.axis_1)
+
+        # at least one bucket per pixel column once the budget has been halved by the last doubling
+        envelopes = StreamEnvelopes(self.columns_plot, 2 * self.axis_1.get_window_extent().width)
+        highlight_spans = (numpy.empty(0), numpy.empty(0))
+        matched = False
+        files = filename if isinstance(filename, list) else [filename]
+        with profile_stage("stream"):
+            for x_axis, block in iter_csv_files(files, columns, self.xaxis_label, rowstart, rowend):
+                envelopes.add(x_axis, block)
+                if expression is not None:
+                    block[self.xaxis_label] = x_axis
+                    mask = expression.evaluate(block, len(x_axis))
+                    highlight_spans = self.__fold_spans(highlight_spans, mask, x_axis, matched, envelopes.width)
+                    matched = len(mask) > 0 and mask[-1]
+        if PROFILER is not None:
+            profile_count("stream", envelopes.rows, sum(os.path.getsize(name) for name in files))
+
+        with profile_stage("fit plot"):
+            x_axis, ydata = envelopes.lines()
+            for line_name, line in self.dict_lines.items():
+                line.set_data(x_axis, ydata[line_name])
+            self.data_limits = envelopes.limits()
+            self.__apply_limits(self.axis_1)
+            self.__label_axis(self.axis_1)
+
+        if expression is not None:
+            with profile_stage("highlights"):
+                self.__draw_highlights(self.axis_1, highlight_spans)
+
+        self.__show(figure_1)
+
+    def __fold_spans(self, spans, mask, x_axis, matched, gap):
+        '''add the runs of matching rows of a block to the spans, merging spans at most gap apart
+
+        matched tells whether the last row of the previous block matched, continuing its span.
+        '''
+        idx = numpy.flatnonzero(mask)
+        if len(idx) == 0:
+            return spans
+
+        breaks = numpy.flatnonzero(numpy.diff(idx) != 1)
+        starts = x_axis[idx[numpy.concatenate(([0], breaks + 1))]]
+        ends = x_axis[idx[numpy.concatenate((breaks, [len(idx) - 1]))]]
+        old_starts, old_ends = spans
+        if matched and idx[0] == 0 and len(old_ends) > 0:
+            old_ends = old_ends.copy()
+            old_ends[-1] = ends[0]
+            starts = starts[1:]
+            ends = ends[1:]
+        starts = numpy.concatenate((old_starts, starts))
+        ends = numpy.concatenate((old_ends, ends))
+
+        # spans closer than a bucket merge when drawn anyway, dropping them keeps the count bounded
+        if len(starts) > 1:
+            gaps = starts[1:] - ends[:-1] > gap
+            starts = starts[numpy.concatenate(([True], gaps))]
+            ends = ends[numpy.concatenate((gaps, [True]))]
+        return starts, ends
+
+    def __add_legend(self, axis):
+        plotter.subplots_adjust(left=0.08, right=0.97, top=0.94, bottom=0.1)
+        legend_values = []
+        for key in self.legend_keys:
+            legend_values.append(self.dict_lines[key])
+
+        if not self.hidelegend:
+            axis.legend(legend_values, self.legend_keys)
+
+    def __show(self, figure):
+        '''show the plot window, or save the PNG file'''
         if self.pngfile is None or len(self.pngfile) == 0:
+            if self.follow_reader is not None:
+                self.__follow_file(figure, self.axis_1)
+            elif self.page_source is not None and not self.scatter:
+                self.__start_paging(figure, self.axis_1)
+            if PROFILER is not None:
+                self.__profile_first_draw(figure)
             plotter.show(block=True)
         else:
             print('saving png file: ' + self.pngfile)
-            plotter.savefig(self.pngfile)
-
+            with profile_stage("render"):
+                plotter.savefig(self.pngfile)
+
+    def __profile_first_draw(self, figure):
+        '''time the window up to its first complete draw as the render stage'''
+        stage = PROFILER.stage("render")
+        stage.__enter__()
+
+        def drawn(event):
+            figure.canvas.mpl_disconnect(connection)
+            stage.__exit__(None, None, None)
+        connection = figure.canvas.mpl_connect('draw_event', drawn)
+
+
+    def __find_spans(self, mask, offset=0):
+        '''x-axis (start, end) arrays of each run of consecutive matching rows, the mask starting at offset'''
+        idx = numpy.flatnonzero(mask) + offset
+        if len(idx) == 0:
+            return numpy.empty(0), numpy.empty(0)
+
+        breaks = numpy.flatnonzero(numpy.diff(idx) != 1)
+        firsts = idx[numpy.concatenate(([0], breaks + 1))]
+        lasts = idx[numpy.concatenate((breaks, [len(idx) - 1]))]
+        x_axis = numpy.asarray(self.x_axis)
+        return x_axis[firsts], x_axis[lasts]
+
+    def __draw_highlights(self, axis, spans):
+        '''draw the highlighted spans as a single collection, merged to the current view'''
+        self.highlight_spans = spans
+        self.highlight_collection = PolyCollection([], facecolors='orange', edgecolors='none', alpha=0.5,
+                                                   transform=axis.get_xaxis_transform())
+        axis.add_collection(self.highlight_collection, autolim=False)
+        self.__update_highlights(axis)
+        axis.callbacks.connect('xlim_changed', self.__update_highlights)
+
+    def __update_highlights(self, axis):
+        '''merge the spans less than a screen pixel apart within the visible x range'''
+        starts, ends = self.highlight_spans
+        min_x, max_x = axis.get_xlim()
+        visible = (ends >= min(min_x, max_x)) & (starts <= max(min_x, max_x))
+        starts = starts[visible]
+        ends = ends[visible]
+
+        if len(starts) > 1:
+            pixel = abs(max_x - min_x) / max(axis.get_window_extent().width, 1)
+            gaps = starts[1:] - ends[:-1] > pixel
+            starts = starts[numpy.concatenate(([True], gaps))]
+            ends = ends[numpy.concatenate((gaps, [True]))]
+
+        # single samples have no width, as before
+        keep = starts != ends
+        starts = starts[keep]
+        ends = ends[keep]
+        verts = numpy.empty((len(starts), 4, 2))
+        verts[:, 0, 0] = verts[:, 1, 0] = starts
+        verts[:, 2, 0] = verts[:, 3, 0] = ends
+        verts[:, :, 1] = (0, 1, 1, 0)
+        self.highlight_collection.set_verts(verts)
 
     def restore_data(self):
         print('restoring session data')
         # check if file is still being used
-        while os.path.exists('csvsession.pickle.lock'):
-            print("waiting for lock on pickle file")
+        while os.path.exists(SESSION_FILE + '.lock'):
+            print("waiting for lock on session file")
             time.sleep(2)
 
-        with open("csvsession.pickle", "rb") as f:
-            self.dict_data = pickle.load(f)
-            self.x_axis = pickle.load(f)
-            self.dict_colors = pickle.load(f)
-            self.color_palette = pickle.load(f)
+        # columns are memory mapped on first use, so only the plotted ones are ever read
+        store = SessionStore(SESSION_FILE)
+        self.dict_data, self.x_axis, self.dict_colors, self.color_palette = store.load()
 
-    def serialize_pickle(self):
+    def serialize_session(self):
         # indicate that file is in use
-        lockfile = open('csvsession.pickle.lock', 'w+')
+        lockfile = open(SESSION_FILE + '.lock', 'w+')
         lockfile.close()
-        with open("csvsession.pickle", "wb") as f:
-            pickle.dump(self.dict_data, f)
-            pickle.dump(self.x_axis, f)
-            pickle.dump(self.dict_colors, f)
-            pickle.dump(self.color_palette, f)
+        store = SessionStore(SESSION_FILE)
+        with profile_stage("session save"):
+            store.save(self.dict_data, self.x_axis, self.dict_colors, self.color_palette)
 
-        if os.path.exists('csvsession.pickle.lock'):
-            os.remove('csvsession.pickle.lock')
+        if os.path.exists(SESSION_FILE + '.lock'):
+            os.remove(SESSION_FILE + '.lock')
 
     def __add_line(self, axis, colname, lines_dict, color_dict, linestyle="-"):
         '''adds a line to the plot. Assigns color and style'''
@@ -354,7 +2696,9 @@ class CSVAnalyzer:
                     lines_dict.pop(col)
                 else:
                     ydata = ydata_dict[col]
-                    lines_dict[col].set_data(xdata, ydata)
+                    # density plots keep the empty line for its legend entry
+                    if not self.density:
+                        lines_dict[col].set_data(xdata, ydata)
                 i += 1
         else:
             for line_name in lines_dict:
@@ -369,28 +2713,269 @@ class CSVAnalyzer:
         return True
 
 
-    def __fit_plot(self, axis, lines, ydata_dict):
-        '''figure out good bounding view for plot'''
-        min_y = float('inf')
-        max_y = float('-inf')
-        min_x_axis = float('inf')
-        max_x_axis = float('-inf')
-
-        if self.scatter:
+    def __decimate_lines(self, figure, axis):
+        '''draw per-pixel min/max envelopes of long lines, recomputed whenever the view changes'''
+        if self.scatter or self.exactlines:
+            return
+
+        x_axis = numpy.asarray(self.x_axis)
+        if numpy.any(x_axis[1:] < x_axis[:-1]):
+            # pixel columns need an ordered x-axis
+            return
+
+        def update(*args):
+            x_axis = numpy.asarray(self.x_axis)
+            min_x, max_x = sorted(axis.get_xlim())
+            width = axis.get_window_extent().width
+            for line_name, line in self.dict_lines.items():
+                ydata = numpy.asarray(self.dict_data[line_name])
+                if len(ydata) == len(x_axis):
+                    line.set_data(*decimate_minmax(x_axis, ydata, min_x, max_x, width))
+
+        update()
+        axis.callbacks.connect('xlim_changed', update)
+        figure.canvas.mpl_connect('resize_event', update)
+        self.lod_update = update
+
+    def set_paging(self, filename, rowstart, rows, useindex=True, dtypes=None):
+        '''step through filename rows at a time from rowstart with the arrow keys of the plot window'''
+        self.page_source = filename
+        self.page_window = (max(rowstart, 1), rows)
+        self.page_options = (useindex, dtypes)
+
+    def __load_window(self, start, rows):
+        '''parse a window of rows and reduce its lines to the plot width, runs on the prefetch thread'''
+        useindex, dtypes = self.page_options
+        dict_data, x_axis = BigCSVReader().get_csv_data(self.page_source, self.columns_plot, self.xaxis_label,
+                                                        start, start + rows - 1, False, True, not useindex, 1,
+                                                        useindex, dtypes)
+        return self.__decimate_window(dict_data, x_axis)
+
+    def __decimate_window(self, dict_data, x_axis):
+        x_axis = numpy.asarray(x_axis)
+        lines = {}
+        ordered = len(x_axis) > 0 and not numpy.any(x_axis[1:] < x_axis[:-1])
+        for line_name in self.dict_lines:
+            ydata = numpy.asarray(dict_data[line_name])
+            if self.exactlines or not ordered or len(ydata) != len(x_axis):
+                lines[line_name] = (x_axis, ydata)
+            else:
+                lines[line_name] = decimate_minmax(x_axis, ydata, x_axis[0], x_axis[-1], self.page_width)
+        return dict_data, x_axis, lines
+
+    def __start_paging(self, figure, axis):
+        '''bind the paging keys and start loading the windows around the shown one'''
+        self.page_width = axis.get_window_extent().width
+        self.page_cache = WindowCache(self.__load_window)
+        self.page_cache.put(self.page_window, self.__decimate_window(self.dict_data, self.x_axis))
+        # the arrow keys step through the view history by default
+        for keymap in ("keymap.back", "keymap.forward"):
+            plotter.rcParams[keymap] = [key for key in plotter.rcParams[keymap] if key not in ("left", "right")]
+        figure.canvas.mpl_connect('key_press_event', self.__page_key)
+        self.__title_window(figure)
+        self.__prefetch_windows()
+        print("paging %i rows at a time: right/left for the next/previous window, up/down to zoom out/in" %
+              self.page_window[1])
+
+    def __title_window(self, figure):
+        start, rows = self.page_window
+        title = "rows %i to %i" % (start, start + len(self.x_axis) - 1)
+        if len(self.title) > 0:
+            title = "%s, %s" % (self.title, title)
+        figure.suptitle(title)
+
+    def __prefetch_windows(self):
+        start, rows = self.page_window
+        self.page_cache.prefetch([(start + rows, rows), (max(start - rows, 1), rows),
+                                  (max(start - rows // 2, 1), rows * 2)])
+
+    def __page_key(self, event):
+        start, rows = self.page_window
+        if event.key in ("right", "pagedown"):
+            start += rows
+        elif event.key in ("left", "pageup"):
+            start = max(start - rows, 1)
+        elif event.key == "up":
+            start = max(start - rows // 2, 1)
+            rows *= 2
+        elif event.key == "down" and rows > 1:
+            start += rows // 4
+            rows = max(rows // 2, 1)
+        else:
+            return
+        if (start, rows) == self.page_window:
+            return
+
+        try:
+            window = self.page_cache.get((start, rows))
+        except (IOError, ValueError) as err:
+            print("Error: {0}".format(err))
+            return
+        if len(window[1]) == 0:
+            print("no rows from row %i on" % start)
+            return
+        self.page_window = (start, rows)
+        self.__show_window(event.canvas.figure, self.axis_1, window)
+
+    def __show_window(self, figure, axis, window):
+        '''swap the lines, limits and highlights over to another window of rows'''
+        self.dict_data, self.x_axis, lines = window
+        for line_name, line in self.dict_lines.items():
+            line.set_data(*lines[line_name])
+        self.data_limits = [float('inf'), float('-inf'), float('inf'), float('-inf')]
+        self.__extend_limits(0)
+        # the lines are reduced to this view already
+        with axis.callbacks.blocked(signal='xlim_changed'):
+            self.__apply_limits(axis)
+        if self.highlight_collection is not None:
+            self.dict_data[self.xaxis_label] = self.x_axis
+            mask = self.highlight_expression.evaluate(self.dict_data, len(self.x_axis))
+            self.highlight_spans = self.__find_spans(mask)
+            self.__update_highlights(axis)
+        self.__title_window(figure)
+        if figure.canvas.toolbar is not None:
+            # home goes back to the whole window
+            figure.canvas.toolbar.update()
+        figure.canvas.draw_idle()
+        self.__prefetch_windows()
+
+    def __follow_file(self, figure, axis):
+        '''poll the followed CSV file on a timer and draw the rows appended to it'''
+        self.follow_timer = figure.canvas.new_timer(interval=int(self.follow_interval * 1000))
+        self.follow_timer.add_callback(self.__refresh_follow, figure, axis)
+        self.follow_timer.start()
+
+    def __refresh_follow(self, figure, axis):
+        '''extend lines, axis limits and highlights with the new rows only'''
+        start = self.follow_reader.read_appended()
+        x_axis = self.follow_reader.xaxis
+        if start >= len(x_axis):
+            return
+
+        self.x_axis = x_axis
+        self.dict_data = dict(self.follow_reader.data)
+        self.dict_data[self.xaxis_label] = self.x_axis
+
+        # grow the data limits by the new rows, keeping any zoom the user chose
+        following = self.fitted_limits is None or self.fitted_limits == (axis.get_xlim(), axis.get_ylim())
+        if start == 0:
+            self.data_limits = [float('inf'), float('-inf'), float('inf'), float('-inf')]
+            self.follow_envelopes = None
+        self.__extend_limits(start)
+        if following:
+            # the envelopes below replace the full reduction the new limits would trigger
+            with axis.callbacks.blocked(signal='xlim_changed'):
+                self.__apply_limits(axis)
+
+        if self.lod_update is not None and self.__fold_envelopes(axis):
+            if following and len(x_axis) <= 4 * axis.get_window_extent().width:
+                for line_name, line in self.dict_lines.items():
+                    line.set_data(x_axis, self.dict_data[line_name])
+            elif following:
+                xs, ys = self.follow_envelopes.lines()
+                for line_name, line in self.dict_lines.items():
+                    line.set_data(xs, ys[line_name])
+            elif x_axis[start] <= max(axis.get_xlim()):
+                # a zoomed view is reduced again only when the new rows reach into it
+                self.lod_update()
+        elif self.scatter:
             i = 0
             for col in self.columns_plot:
                 if i % 2 == 0:
-                    min_x_axis = min(min_x_axis, min(ydata_dict[col]))
-                    max_x_axis = max(max_x_axis, max(ydata_dict[col]))
+                    xdata = self.dict_data[col]
+                elif not self.density:
+                    self.dict_lines[col].set_data(xdata, self.dict_data[col])
                 i += 1
         else:
-            min_x_axis = self.x_axis[0]
+            for line_name, line in self.dict_lines.items():
+                line.set_data(self.x_axis, self.dict_data[line_name])
+
+        if self.highlight_expression is not None and self.highlight_spans is not None:
+            new_rows = {}
+            for name in self.highlight_expression.columns:
+                new_rows[name] = numpy.asarray(self.dict_data[name])[start:]
+            starts, ends = self.__find_spans(self.highlight_expression.evaluate(new_rows, len(x_axis) - start), start)
+            if start > 0:
+                starts = numpy.concatenate((self.highlight_spans[0], starts))
+                ends = numpy.concatenate((self.highlight_spans[1], ends))
+            self.highlight_spans = (starts, ends)
+            self.__update_highlights(axis)
+
+        figure.canvas.draw_idle()
+
+    def __fold_envelopes(self, axis):
+        '''fold the rows appended since the last refresh into the envelopes of the whole followed file'''
+        x_axis = numpy.asarray(self.x_axis)
+        if self.follow_envelopes is None:
+            self.follow_envelopes = StreamEnvelopes(self.dict_lines, 2 * axis.get_window_extent().width)
+            self.follow_folded = 0
+        start = self.follow_folded
+        if numpy.any(x_axis[start + 1:] < x_axis[start:-1]) or (0 < start < len(x_axis) and
+                                                                 x_axis[start] < x_axis[start - 1]):
+            # pixel columns need an ordered x-axis
+            return False
+        self.follow_envelopes.add(x_axis[start:], {name: numpy.asarray(self.dict_data[name])[start:]
+                                                   for name in self.dict_lines})
+        self.follow_folded = len(x_axis)
+        return True
+
+    def __draw_density(self, axis, ydata_dict):
+        '''draw each scatter pair as a 2D histogram image in its line color, one bin per pixel'''
+        min_x, max_x = axis.get_xlim()
+        min_y, max_y = axis.get_ylim()
+        bbox = axis.get_window_extent()
+        bins = (max(int(bbox.width), 1), max(int(bbox.height), 1))
+
+        i = 0
+        for col in self.columns_plot:
+            if i % 2 == 0:
+                xdata = numpy.asarray(ydata_dict[col], dtype=numpy.float64)
+            elif col in self.dict_lines:
+                ydata = numpy.asarray(ydata_dict[col], dtype=numpy.float64)
+                finite = numpy.isfinite(xdata) & numpy.isfinite(ydata)
+                counts, xedges, yedges = numpy.histogram2d(xdata[finite], ydata[finite], bins=bins,
+                                                           range=((min_x, max_x), (min_y, max_y)))
+                # log scaled opacity, empty bins stay transparent
+                alpha = numpy.log1p(counts.T)
+                if alpha.max() > 0:
+                    alpha /= alpha.max()
+                image = numpy.empty(alpha.shape + (4,))
+                image[:, :, :3] = mcolors.to_rgb(self.dict_lines[col].get_color())
+                image[:, :, 3] = alpha
+                axis.imshow(image, extent=(min_x, max_x, min_y, max_y), origin='lower', aspect='auto',
+                            interpolation='nearest')
+            i += 1
+
+    def __extend_limits(self, start, lines=None, ydata_dict=None):
+        '''grow the data limits by the rows from start on'''
+        if lines is None:
+            lines = self.dict_lines
+        if ydata_dict is None:
+            ydata_dict = self.dict_data
+        min_x_axis, max_x_axis, min_y, max_y = self.data_limits
+
+        if self.scatter:
+            i = 0
+            for col in self.columns_plot:
+                if i % 2 == 0 and len(ydata_dict[col]) > start:
+                    min_x_axis = min(min_x_axis, numpy.amin(ydata_dict[col][start:]))
+                    max_x_axis = max(max_x_axis, numpy.amax(ydata_dict[col][start:]))
+                i += 1
+        elif len(self.x_axis) > start:
+            min_x_axis = min(min_x_axis, self.x_axis[0])
             max_x_axis = self.x_axis[-1]
 
         for line_name in lines:
-            if line_name in ydata_dict and len(ydata_dict[line_name]) > 0:
-                min_y = min(min_y, min(ydata_dict[line_name]))
-                max_y = max(max_y, max(ydata_dict[line_name]))
+            if line_name in ydata_dict and len(ydata_dict[line_name]) > start:
+                min_y = min(min_y, numpy.amin(ydata_dict[line_name][start:]))
+                max_y = max(max_y, numpy.amax(ydata_dict[line_name][start:]))
+
+        self.data_limits = [min_x_axis, max_x_axis, min_y, max_y]
+
+    def __apply_limits(self, axis):
+        min_x_axis, max_x_axis, min_y, max_y = self.data_limits
+        if not numpy.all(numpy.isfinite(self.data_limits)):
+            return
 
         if max_y != 0:
             max_y += 5
@@ -400,24 +2985,192 @@ class CSVAnalyzer:
 
         axis.set_ylim(min_y, max_y)
         axis.set_xlim(min_x_axis, max_x_axis)
+        self.fitted_limits = (axis.get_xlim(), axis.get_ylim())
+
+    def __fit_plot(self, axis, lines, ydata_dict):
+        '''figure out good bounding view for plot'''
+        self.data_limits = [float('inf'), float('-inf'), float('inf'), float('-inf')]
+        self.__extend_limits(0, lines, ydata_dict)
+        self.__apply_limits(axis)
+        self.__label_axis(axis)
+
+    def __label_axis(self, axis):
         axis.set_xlabel(self.xaxis_label)
         if not self.yaxis_label is None and len(self.yaxis_label) > 0:
             axis.set_ylabel(self.yaxis_label)
         axis.grid(True)
 
 
-    def get_csv_data(self, filename, columns, xaxis_name, rowstart, rowend, rawreadmode):
+    def get_csv_data(self, filename, columns, xaxis_name, rowstart, rowend, rawreadmode, blockreadmode=False,
+                     singlepass=False, jobs=1, useindex=True, dtypes=None):
         '''parse the raw CSV data from the source file'''
         reader = BigCSVReader()
-        return reader.get_csv_data(filename, columns, xaxis_name, rowstart, rowend, rawreadmode)
+        return reader.get_csv_data(filename, columns, xaxis_name, rowstart, rowend, rawreadmode, blockreadmode,
+                                   singlepass, jobs, useindex, dtypes)
+
+# data shared with the processes rendering a --batch, set before they are forked
+BATCH_SOURCE = None
+
+def load_batch_specs(filename):
+    '''read the JSON list of plot specs of a --batch file'''
+    with open(filename, 'r') as f:
+        specs = json.load(f)
+    if not isinstance(specs, list):
+        raise ValueError("batch file %s must hold a list of plot specs" % filename)
+    for spec in specs:
+        if not isinstance(spec, dict) or "columns" not in spec or "png" not in spec:
+            raise ValueError("every plot spec in %s needs \"columns\" and \"png\"" % filename)
+    return specs
+
+def render_batch_spec(spec):
+    '''draw one plot spec from the data of BATCH_SOURCE, returning an error message or None'''
+    source = BATCH_SOURCE
+    columns = list(spec["columns"])
+    scatter = spec.get("scatter", source.scatter)
+    xaxis_label = source.xaxis_label
+    if scatter:
+        xaxis_label = ",".join(columns[0::2])
+    elif xaxis_label in columns:
+        columns.remove(xaxis_label)
+
+    analyzer = CSVAnalyzer(columns, xaxis_label, spec.get("yaxislabel", source.yaxis_label),
+                           spec.get("colorbyplot", source.colorbyplot), scatter,
+                           spec.get("hidelegend", source.hidelegend), spec["png"],
+                           spec.get("exact", source.exactlines), spec.get("density", source.density))
+    # shallow copy, plot() adds the x-axis under its label
+    analyzer.dict_data = dict(source.dict_data)
+    analyzer.x_axis = source.x_axis
+    try:
+        missing = [col for col in columns if col not in analyzer.dict_data]
+        if len(missing) > 0:
+            raise ValueError("columns not loaded: " + ", ".join(missing))
+        analyzer.plot(spec.get("title", ""), spec.get("filter", ""))
+    except ValueError as err:
+        return "{0}: {1}".format(spec["png"], err)
+    finally:
+        plotter.close('all')
+    return None
+
+def render_batch(source, specs, jobs):
+    '''render every plot spec headless from the data loaded by source, returning the error messages'''
+    global BATCH_SOURCE
+    BATCH_SOURCE = source
+    load_matplotlib(True)
+    if jobs > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        # forked workers share the loaded arrays with this process instead of receiving copies
+        with multiprocessing.get_context('fork').Pool(jobs) as pool:
+            errors = pool.map(render_batch_spec, specs, chunksize=1)
+    else:
+        errors = [render_batch_spec(spec) for spec in specs]
+    return [err for err in errors if err is not None]
+
+class PlotServer:
+    '''serves plot requests on a Unix socket from data kept loaded in memory, drawing each in a forked process'''
+    def __init__(self, analyzer, path=SESSION_SOCKET):
+        self.analyzer = analyzer
+        self.path = path
+
+    def serve(self):
+        if send_plot_request(self.path, {"command": "ping"}) is not None:
+            raise IOError(98, "a plot server is already listening on " + self.path)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen(16)
+        # import the plotting modules once rather than in every forked plot process, the
+        # backend is still picked by the first figure each process draws
+        load_matplotlib()
+        # finished plot processes are reaped automatically
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        print("serving plots on " + self.path)
+        try:
+            while True:
+                conn, address = server.accept()
+                if os.fork() == 0:
+                    # the plot process must never unwind into the server loop and its cleanup
+                    status = 1
+                    try:
+                        server.close()
+                        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                        status = self.__handle(conn)
+                    except BaseException as err:
+                        print("plot request failed: {0}".format(err))
+                        status = 1
+                    finally:
+                        os._exit(status)
+                conn.close()
+        finally:
+            server.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def __reply(self, conn, reply):
+        conn.sendall(json.dumps(reply).encode() + b"\n")
+
+    def __handle(self, conn):
+        '''plot one request, replying once the plot is saved or about to be shown'''
+        with conn:
+            request = json.loads(conn.makefile('rb').readline().decode())
+            if request.get("command") == "ping":
+                self.__reply(conn, {"status": "ok"})
+                return 0
+
+            # the client names its own x-axis, the column pairs of a scatter plot or the label of the x values
+            analyzer = CSVAnalyzer(request["columns"], request["xaxis"], request["yaxislabel"],
+                                   request["colorbyplot"], request["scatter"], request["hidelegend"],
+                                   request["png"], request["exact"], request["density"])
+            analyzer.dict_data = self.analyzer.dict_data
+            analyzer.x_axis = self.analyzer.x_axis
+            analyzer.dict_colors = dict(self.analyzer.dict_colors)
+            analyzer.color_palette = list(self.analyzer.color_palette)
+
+            missing = [col for col in request["columns"] if col not in analyzer.dict_data]
+            try:
+                if len(missing) > 0:
+                    raise ValueError("columns not loaded by the server: " + ", ".join(missing))
+                if len(request["filter"]) > 0:
+                    compile_filter(request["filter"])
+                if len(request["png"]) > 0:
+                    analyzer.plot(request["title"], request["filter"])
+                    self.__reply(conn, {"status": "ok"})
+                    return 0
+                self.__reply(conn, {"status": "ok"})
+            except Exception as err:
+                self.__reply(conn, {"status": "error", "message": str(err)})
+                return 1
+
+        # interactive windows stay open in this process until closed
+        analyzer.plot(request["title"], request["filter"])
+        return 0
+
+def send_plot_request(path, request):
+    '''send a request to a running plot server, returning its reply or None when no server is listening'''
+    if not os.path.exists(path):
+        return None
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with client:
+        try:
+            client.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return None
+        client.sendall(json.dumps(request).encode() + b"\n")
+        reply = client.makefile('rb').readline()
+    if len(reply) == 0:
+        return {"status": "error", "message": "plot server closed the connection"}
+    return json.loads(reply.decode())
 
 def main():
     parser = argparse.ArgumentParser(description='Plot collection of variables from a csv file.')
-    parser.add_argument('-f', '--file', metavar='FILE', type=str,
-                        help='CSV file to plot', default='')
+    parser.add_argument('-f', '--file', metavar='FILE', type=str, action='append',
+                        help='CSV file to plot, repeat or use a quoted glob pattern such as "run_*.csv" to load '
+                             'several files as one', default=[])
     parser.add_argument('-x', '--xaxis', metavar='X_COL_NAME', type=str,
                         help='column name of x-axis. Omission assumes first column name is x-axis')
-    parser.add_argument('columns_plot', metavar='COL_NAME', type=str, nargs='+',
+    parser.add_argument('columns_plot', metavar='COL_NAME', type=str, nargs='*',
                         help='column name(s) of the plot items')
     parser.add_argument('-r', '--rowstart', metavar='STARTROW', type=int,
                         help='row start number', default=0)
@@ -438,10 +3191,70 @@ def main():
                         default=False)
     parser.add_argument('--scatter', action='store_true',
                         help='Create scatter plots from pairs of header names', default=False)
+    parser.add_argument('--density', action='store_true',
+                        help='With --scatter, draw the point density of each pair as an image', default=False)
     parser.add_argument('--colorbyplot', action='store_true',
                         help='Keep plot color scheme consistent by plot order', default=False)
     parser.add_argument('--rawparse', action='store_true',
                         help='Parse CSV files using raw I/O rather than csv module', default=False)
+    parser.add_argument('--blockparse', action='store_true',
+                        help='Parse numeric CSV files in blocks of raw bytes directly into numpy arrays',
+                        default=False)
+    parser.add_argument('--singlepass', action='store_true',
+                        help='Read the CSV file once, skipping the up-front line count used for progress',
+                        default=False)
+    parser.add_argument('-j', '--jobs', metavar='N', type=int,
+                        help='Parse numeric CSV files with the block parser in N parallel processes', default=1)
+    parser.add_argument('--dtype', metavar='SPEC', type=str,
+                        help='Storage type of the loaded columns: float64, float32, int64, int32 or auto, '
+                             'optionally per column as COL=TYPE, comma separated', default='')
+    parser.add_argument('--noindex', action='store_true',
+                        help='Do not read or write the .rowindex file used to seek to --rowstart', default=False)
+    parser.add_argument('--cachedir', metavar='DIR', type=str,
+                        help='directory caching previously loaded CSV files', default=CACHE_DIR)
+    parser.add_argument('--cachesize', metavar='MB', type=int,
+                        help='size cap of the cache directory in megabytes', default=CACHE_SIZE_MB)
+    parser.add_argument('--nocache', action='store_true',
+                        help='Always parse the CSV file, neither reading nor writing the cache', default=False)
+    parser.add_argument('--exact', action='store_true',
+                        help='Draw every sample instead of per-pixel min/max envelopes of long lines',
+                        default=False)
+    parser.add_argument('--batch', metavar='SPEC_FILE', type=str,
+                        help='Render every plot of a JSON list of plot specs to PNG from one load of the data',
+                        default='')
+    parser.add_argument('--follow', metavar='SECONDS', type=float, nargs='?', const=1.0,
+                        help='Keep parsing lines appended to the CSV file, redrawing every SECONDS (1)', default=0)
+    parser.add_argument('--stats', action='store_true',
+                        help='Print count, min, max, mean, std and approximate percentiles of the columns from one '
+                             'streaming pass instead of plotting, or write them to --statsout', default=False)
+    parser.add_argument('--statsout', metavar='JSON_FILE', type=str,
+                        help='With --stats, write the statistics to JSON_FILE instead of a table', default='')
+    parser.add_argument('--aggregate', metavar='WIDTH', type=float,
+                        help='Write the count, mean, min and max of the columns per WIDTH units of the x-axis to '
+                             '--aggregateout instead of plotting', default=0)
+    parser.add_argument('--aggregateout', metavar='CSV_FILE', type=str,
+                        help='output file of --aggregate', default='aggregate.csv')
+    parser.add_argument('--export', metavar='FILE', type=str,
+                        help='Write the x-axis and the loaded columns to FILE instead of plotting, as NPZ (.npz), '
+                             'Arrow IPC (.arrow, .feather) or Parquet (.parquet)', default='')
+    parser.add_argument('--page', metavar='ROWS', type=int,
+                        help='Show ROWS rows from --rowstart and step through the file with the arrow keys: '
+                             'right/left for the next/previous rows, up/down to zoom out/in', default=0)
+    parser.add_argument('--stream', action='store_true',
+                        help='Plot files larger than memory in one pass, keeping only per-pixel min/max envelopes '
+                             'of the lines', default=False)
+    parser.add_argument('--server', action='store_true',
+                        help='Keep the loaded data in memory and serve --sessioncontinue plots from it', default=False)
+    parser.add_argument('--socket', metavar='PATH', type=str,
+                        help='Unix socket of the plot server', default=SESSION_SOCKET)
+    parser.add_argument('--profile', action='store_true',
+                        help='Time every stage, printing a table at exit or writing it to --profileout', default=False)
+    parser.add_argument('--profileout', metavar='JSON_FILE', type=str,
+                        help='With --profile, write the stage timings to JSON_FILE instead of a table', default='')
+    parser.add_argument('--cprofile', metavar='FILE', type=str,
+                        help='With --profile, write cProfile stats of the whole run to FILE', default='')
+    parser.add_argument('--tracemalloc', metavar='FILE', type=str,
+                        help='With --profile, write the largest allocation sites to FILE', default='')
     parser.add_argument('--hidelegend', action='store_true',
                         help='Hide the legend', default=False)
     parser.add_argument('--yaxislabel', '-y', metavar='Y_AXIS_LABEL', type=str,
@@ -452,6 +3265,31 @@ def main():
     args = parser.parse_args()
     xaxis_label = ""
 
+    try:
+        dtypes = parse_dtypes(args.dtype)
+    except ValueError as err:
+        print("Error: {0}".format(err))
+        exit(1)
+
+    if args.profile or len(args.cprofile) > 0 or len(args.tracemalloc) > 0:
+        start_profiling(args.profileout, args.cprofile, args.tracemalloc)
+
+    specs = []
+    if len(args.batch) > 0:
+        try:
+            specs = load_batch_specs(args.batch)
+        except IOError as err:
+            print("I/O error({0}): {1}".format(err.errno, err.strerror))
+            exit(1)
+        except ValueError as err:
+            print("Error: {0}".format(err))
+            exit(1)
+        # load the union of the columns of every plot, including the x-axis
+        for spec in specs:
+            for col in spec["columns"]:
+                if col not in args.columns_plot:
+                    args.columns_plot.append(col)
+
     if (len(args.file) == 0 and not args.sessioncontinue) or len(args.columns_plot) == 0:
         parser.print_help()
         exit(1)
@@ -469,29 +3307,140 @@ def main():
                     break
             col_cnt += 1
 
+    columns = args.columns_plot
+    if not args.scatter and xaxis_label in columns and len(specs) == 0:
+        columns.remove(xaxis_label)
+
+    try:
+        files = expand_csv_files(args.file)
+    except IOError as err:
+        print("I/O error({0}): {1}".format(err.errno, err.strerror))
+        exit(1)
+    source = files[0] if len(files) == 1 else files
+    if len(files) == 0:
+        source = ''
+
+    # the first window is loaded like any other row range, the rest once the window is open
+    paging = args.page > 0 and len(files) == 1 and not args.sessioncontinue and args.follow <= 0 and \
+        not args.scatter and not args.stream and not args.stats and args.aggregate <= 0 and len(specs) == 0
+    if paging:
+        args.rowstart = max(args.rowstart, 1)
+        args.rowend = args.rowstart + args.page - 1
+    elif args.page > 0:
+        print("--page steps through the timeseries plot of a single CSV file, ignoring it")
+
+    # summaries stream through the file block by block instead of loading it
+    if args.stats or args.aggregate > 0:
+        try:
+            if args.sessioncontinue:
+                dict_data, x_axis, dict_colors, color_palette = SessionStore(SESSION_FILE).load()
+                blocks = [(x_axis, {col: dict_data[col] for col in columns if col in dict_data})]
+            else:
+                blocks = iter_csv_files(files, columns, xaxis_label, args.rowstart, args.rowend)
+            stats, resample = summarize_data(blocks, columns, args.aggregate)
+            if args.stats:
+                report_stats(stats, args.statsout)
+            if resample is not None:
+                count = resample.write(args.aggregateout)
+                print("%i buckets written to %s" % (count, args.aggregateout))
+        except IOError as err:
+            print("I/O error({0}): {1}".format(err.errno, err.strerror))
+            exit(1)
+        except ValueError as err:
+            print("Error: {0}".format(err))
+            exit(1)
+        exit(0)
+
+    # envelopes are folded in while the file streams by, the columns are never loaded
+    if args.stream and not args.sessioncontinue and len(specs) == 0:
+        try:
+            analyzer = CSVAnalyzer(columns, xaxis_label, args.yaxislabel, args.colorbyplot, args.scatter,
+                                   args.hidelegend, args.png)
+            analyzer.plot_stream(source, args.rowstart, args.rowend, args.title, args.filter)
+        except IOError as err:
+            print("I/O error({0}): {1}".format(err.errno, err.strerror))
+            exit(1)
+        except ValueError as err:
+            print("Error: {0}".format(err))
+            exit(1)
+        exit(0)
+
+    # a running plot server already holds the session data, let it draw
+    if args.sessioncontinue and not args.server and not args.terminate and len(specs) == 0:
+        reply = send_plot_request(args.socket, {
+            "columns": columns, "xaxis": xaxis_label, "title": args.title, "filter": args.filter,
+            "yaxislabel": args.yaxislabel, "colorbyplot": args.colorbyplot, "scatter": args.scatter,
+            "hidelegend": args.hidelegend, "png": os.path.abspath(args.png) if len(args.png) > 0 else "",
+            "exact": args.exact, "density": args.density})
+        if reply is not None:
+            if reply["status"] != "ok":
+                print("Error: {0}".format(reply["message"]))
+                exit(1)
+            exit(0)
+
     try:
-        columns = args.columns_plot
-        if not args.scatter and xaxis_label in columns:
-            columns.remove(xaxis_label)
-        analyzer = CSVAnalyzer(columns, xaxis_label, args.yaxislabel, args.colorbyplot, args.scatter, args.hidelegend, args.png)
-        analyzer.load_data(args.file, args.rowstart, args.rowend,
-                           args.sessioncontinue, args.rawparse)
+        cache = None
+        if not args.nocache:
+            cache = SessionCache(args.cachedir, args.cachesize * 1024 * 1024)
+        analyzer = CSVAnalyzer(columns, xaxis_label, args.yaxislabel, args.colorbyplot, args.scatter, args.hidelegend, args.png,
+                               args.exact, args.density)
+        analyzer.load_data(source, args.rowstart, args.rowend,
+                           args.sessioncontinue, args.rawparse, args.blockparse,
+                           args.singlepass, args.jobs, not args.noindex, cache, args.follow, dtypes)
     except IOError as err:
         print("I/O error({0}): {1}".format(err.errno, err.strerror))
         exit(1)
+    except ValueError as err:
+        print("Error: {0}".format(err))
+        exit(1)
     except:  # handle other exceptions
         print("Unexpected error:", sys.exc_info()[0])
         exit(1)
 
 
-    # serialize data so we can reload CSV data from the pickle file later
+    # serialize data so we can reload CSV data from the session file later
     if args.sessionstart:
-        analyzer.serialize_pickle()
+        analyzer.serialize_session()
+
+    if len(args.export) > 0:
+        try:
+            count = export_columns(args.export, analyzer.dict_data, analyzer.x_axis, xaxis_label)
+        except IOError as err:
+            print("I/O error({0}): {1}".format(err.errno, err.strerror))
+            exit(1)
+        except ValueError as err:
+            print("Error: {0}".format(err))
+            exit(1)
+        print("%i columns written to %s" % (count, args.export))
+        exit(0)
+
+    if args.server:
+        try:
+            PlotServer(analyzer, args.socket).serve()
+        except IOError as err:
+            print("I/O error({0}): {1}".format(err.errno, err.strerror))
+            exit(1)
+        except KeyboardInterrupt:
+            pass
+        exit(0)
 
     if args.terminate:
         exit(0)
 
-    analyzer.plot(args.title, args.filter)
+    if len(specs) > 0:
+        errors = render_batch(analyzer, specs, args.jobs)
+        for err in errors:
+            print("Error: {0}".format(err))
+        exit(1 if len(errors) > 0 else 0)
+
+    if paging:
+        analyzer.set_paging(source, args.rowstart, args.page, not args.noindex, dtypes)
+
+    try:
+        analyzer.plot(args.title, args.filter)
+    except ValueError as err:
+        print("Error: {0}".format(err))
+        exit(1)
 
     exit(0)
 
@@ -0,0 +1,220 @@
+#!/usr/bin/python3
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os, sys
+import platform
+import resource
+import statistics
+import time
+
+testdir = os.path.dirname(os.path.abspath(__file__))
+srcdir = '../csv_analyzer'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+from generate_synthetic_data import FORMATS, column_names, write_synthetic_csv
+
+# loads measured for every selectivity, the other stages load with the block parser
+LOAD_MODES = {
+    "csv": {},
+    "raw": {"rawmode": True},
+    "block": {"blockmode": True, "singlepass": True},
+    "jobs": {"jobs": 4},
+}
+
+def load_reader(filename, columns, mode):
+    import csv_analyzer
+    return csv_analyzer.BigCSVReader().get_csv_data(filename, columns, "t", 0, 0, useindex=False,
+                                                    **LOAD_MODES[mode])
+
+def load_analyzer(filename, columns, png=""):
+    import csv_analyzer
+    analyzer = csv_analyzer.CSVAnalyzer(columns, "t", "", False, False, True, png)
+    analyzer.load_data(filename, 0, 0, False, blockreadmode=True, singlepass=True, useindex=False)
+    return analyzer
+
+def filter_text(columns):
+    return "{0} > 0 and {1} < 100".format(columns[0], columns[-1])
+
+def run_stage(stage, filename, columns, workdir):
+    '''measure one stage in a fresh process, returns the seconds taken and the peak RSS in bytes'''
+    os.chdir(workdir)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        import csv_analyzer
+        if stage.startswith("load-"):
+            start = time.perf_counter()
+            load_reader(filename, columns, stage[5:])
+            seconds = time.perf_counter() - start
+        elif stage == "session-save":
+            analyzer = load_analyzer(filename, columns)
+            start = time.perf_counter()
+            analyzer.serialize_session()
+            seconds = time.perf_counter() - start
+        elif stage == "session-restore":
+            analyzer = csv_analyzer.CSVAnalyzer(columns, "t", "", False, False, True, "")
+            start = time.perf_counter()
+            analyzer.load_data(filename, 0, 0, True)
+            # columns are mapped lazily, reading them is part of the restore
+            for col in columns:
+                analyzer.dict_data[col].sum()
+            seconds = time.perf_counter() - start
+        elif stage == "filter":
+            analyzer = load_analyzer(filename, columns)
+            start = time.perf_counter()
+            expression = csv_analyzer.FilterExpression(filter_text(columns))
+            expression.evaluate(analyzer.dict_data, len(analyzer.x_axis))
+            seconds = time.perf_counter() - start
+        elif stage == "render-png":
+            analyzer = load_analyzer(filename, columns, os.path.join(workdir, "benchmark.png"))
+            start = time.perf_counter()
+            analyzer.plot("benchmark", filter_text(columns))
+            seconds = time.perf_counter() - start
+        else:
+            raise ValueError("unknown stage " + stage)
+
+    return seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def run_child(conn, stage, filename, columns, workdir):
+    # spawned processes start their own pools by spawning too, go back to the platform default
+    multiprocessing.set_start_method(multiprocessing.get_all_start_methods()[0], force=True)
+    conn.send(run_stage(stage, filename, columns, workdir))
+    conn.close()
+
+def measure(context, stage, filename, columns, workdir):
+    '''run a stage in its own process, which may start a pool of its own for parallel loading'''
+    receiver, sender = context.Pipe(False)
+    process = context.Process(target=run_child, args=(sender, stage, filename, columns, workdir))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = None
+    process.join()
+    if result is None:
+        raise RuntimeError("%s failed on %s" % (stage, filename))
+    return result
+
+def summarize(case, stage, runs, rows, size):
+    seconds = [run[0] for run in runs]
+    mean = statistics.mean(seconds)
+    stdev = statistics.stdev(seconds) if len(seconds) > 1 else 0.0
+    best = min(seconds)
+    return {
+        "case": case, "stage": stage, "rows": rows, "bytes": size,
+        "seconds": seconds, "mean_s": mean, "stdev_s": stdev, "min_s": best,
+        "rsd_percent": 100.0 * stdev / mean if mean > 0 else 0.0,
+        "rows_per_s": rows / best if best > 0 else 0.0,
+        "mb_per_s": size / best / 1e6 if best > 0 else 0.0,
+        "peak_rss_mb": max(run[1] for run in runs) / 1e6,
+    }
+
+def compare(results, baseline, threshold):
+    '''print the change of every measurement against a baseline, returns the number of regressions'''
+    previous = {(r["case"], r["stage"]): r for r in baseline["results"]}
+    regressions = 0
+    print("%-40s %-16s %10s %10s %8s" % ("case", "stage", "base s", "now s", "change"))
+    for result in results:
+        base = previous.get((result["case"], result["stage"]))
+        if base is None:
+            continue
+        change = 100.0 * (result["min_s"] / base["min_s"] - 1.0) if base["min_s"] > 0 else 0.0
+        # slower than the threshold plus the noise seen in either run
+        noise = max(result["rsd_percent"], base["rsd_percent"])
+        flag = ""
+        if change > threshold + noise:
+            flag = " REGRESSION"
+            regressions += 1
+        print("%-40s %-16s %10.4f %10.4f %+7.1f%%%s" % (result["case"], result["stage"], base["min_s"],
+                                                       result["min_s"], change, flag))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark loading, session files, filtering and rendering '
+                                                 'on generated CSV files.')
+    parser.add_argument('-d', '--datadir', metavar='DIR', type=str, default=os.path.join(testdir, "benchmark_data"),
+                        help='directory of the generated CSV files, kept between runs')
+    parser.add_argument('--rows', metavar='ROWS', type=int, nargs='+', default=[100000, 1000000],
+                        help='row counts of the generated files')
+    parser.add_argument('--cols', metavar='COLS', type=int, nargs='+', default=[6, 24],
+                        help='column counts of the generated files')
+    parser.add_argument('--formats', choices=sorted(FORMATS.keys()) + ["mixed"], nargs='+',
+                        default=["float", "mixed"], help='number formats of the generated files')
+    parser.add_argument('--select', metavar='FRACTION', type=float, nargs='+', default=[0.25, 1.0],
+                        help='fractions of the columns loaded')
+    parser.add_argument('--modes', choices=sorted(LOAD_MODES.keys()), nargs='+', default=["csv", "block", "jobs"],
+                        help='loading modes measured')
+    parser.add_argument('--stages', nargs='+', default=["load", "session-save", "session-restore", "filter", "render-png"],
+                        help='stages measured')
+    parser.add_argument('-n', '--repeats', metavar='N', type=int, default=3,
+                        help='runs of every measurement')
+    parser.add_argument('-s', '--seed', metavar='SEED', type=int, default=0,
+                        help='random seed of the generated files')
+    parser.add_argument('-o', '--output', metavar='JSON', type=str, default="benchmark.json",
+                        help='results file')
+    parser.add_argument('-b', '--baseline', metavar='JSON', type=str, default="",
+                        help='earlier results file to compare against')
+    parser.add_argument('-t', '--threshold', metavar='PERCENT', type=float, default=10.0,
+                        help='slowdown against the baseline reported as a regression')
+
+    args = parser.parse_args()
+    os.makedirs(args.datadir, exist_ok=True)
+    workdir = os.path.abspath(args.datadir)
+
+    # every run gets a fresh interpreter so the peak RSS belongs to that run alone
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for rows in args.rows:
+        for cols in args.cols:
+            for numformat in args.formats:
+                name = "synthetic-%i-%i-%s-%i.csv" % (rows, cols, numformat, args.seed)
+                filename = os.path.join(workdir, name)
+                if not os.path.exists(filename):
+                    print("generating " + name)
+                    write_synthetic_csv(filename, rows, cols, numformat, args.seed)
+                size = os.path.getsize(filename)
+                names = column_names(cols)[1:]
+
+                stages = []
+                for fraction in args.select:
+                    columns = names[:max(1, int(round(fraction * len(names))))]
+                    if "load" in args.stages:
+                        stages += [("load-" + mode, columns, "%.2f" % fraction) for mode in args.modes]
+                for stage in args.stages:
+                    if stage != "load":
+                        stages.append((stage, names, "1.00"))
+
+                for stage, columns, fraction in stages:
+                    case = "%i rows %i cols %s select %s" % (rows, cols, numformat, fraction)
+                    if stage == "session-restore":
+                        # restore the session of this file, not the one written last
+                        measure(context, "session-save", filename, columns, workdir)
+                    runs = [measure(context, stage, filename, columns, workdir)
+                            for i in range(args.repeats)]
+                    result = summarize(case, stage, runs, rows, size)
+                    results.append(result)
+                    print("%-40s %-16s %8.4f s +-%5.1f%% %9.1f MB/s %8.1f MB RSS" % (
+                        case, stage, result["min_s"], result["rsd_percent"], result["mb_per_s"],
+                        result["peak_rss_mb"]))
+
+    import numpy
+    report = {
+        "meta": {"python": platform.python_version(), "numpy": numpy.__version__,
+                 "platform": platform.platform(), "cpus": os.cpu_count(),
+                 "seed": args.seed, "repeats": args.repeats, "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print("results written to " + args.output)
+
+    if len(args.baseline) > 0:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold) > 0:
+            exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+
+import argparse
+import numpy
+
+# number formats of the generated value columns, 'mixed' cycles through the others
+FORMATS = {"float": "%.6f", "int": "%d", "sci": "%.9e"}
+CHUNK_ROWS = 100000
+
+def column_formats(cols, numformat):
+    '''printf format of each column, the time column first'''
+    if numformat == "mixed":
+        names = sorted(FORMATS.keys())
+        return ["%.6f"] + [FORMATS[names[i % len(names)]] for i in range(cols - 1)]
+    return ["%.6f"] + [FORMATS[numformat]] * (cols - 1)
+
+def column_names(cols):
+    return ["t"] + ["c%i" % i for i in range(1, cols)]
+
+def write_synthetic_csv(filename, rows, cols=6, numformat="float", seed=0):
+    '''write a CSV of a time column followed by random walks, identical for the same arguments'''
+    rng = numpy.random.default_rng(seed)
+    formats = column_formats(cols, numformat)
+    level = numpy.zeros(cols - 1)
+    with open(filename, 'w') as f:
+        f.write(",".join(column_names(cols)) + "\n")
+        for start in range(0, rows, CHUNK_ROWS):
+            nrows = min(CHUNK_ROWS, rows - start)
+            steps = rng.standard_normal((nrows, cols - 1)) * 10.0
+            values = numpy.empty((nrows, cols))
+            values[:, 0] = numpy.arange(start, start + nrows) * 0.001
+            values[:, 1:] = level + numpy.cumsum(steps, axis=0)
+            level = values[-1, 1:]
+            numpy.savetxt(f, values, fmt=formats, delimiter=",")
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a deterministic synthetic CSV file')
+    parser.add_argument('-f', '--outputfile', metavar='OUTPUT', type=str,
+                        default="synthetic.csv", help='output file (synthetic.csv)')
+    parser.add_argument('-r', '--rows', metavar='ROWS', type=int,
+                        default=1000000, help='number of rows')
+    parser.add_argument('-c', '--cols', metavar='COLS', type=int,
+                        default=6, help='number of columns, including the time column')
+    parser.add_argument('-n', '--numformat', choices=sorted(FORMATS.keys()) + ["mixed"],
+                        default="float", help='number format of the value columns')
+    parser.add_argument('-s', '--seed', metavar='SEED', type=int,
+                        default=0, help='random seed')
+
+    args = parser.parse_args()
+    write_synthetic_csv(args.outputfile, args.rows, args.cols, args.numformat, args.seed)
+    print("done")
+
+if __name__ == "__main__":
+    main()
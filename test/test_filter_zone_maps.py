@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+
+import argparse
+import os, sys
+import tempfile
+import numpy
+
+testdir = os.path.dirname(__file__)
+srcdir = '../csv_analyzer'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import csv_analyzer
+from csv_analyzer import FilterExpression, SessionStore
+
+# expressions whose zone map pruning is compared against evaluating every row
+EXPRESSIONS = [
+    "t > 400",
+    "t >= 100 AND t < 101",
+    "SELECT a WHERE b == 7",
+    "b != 7",
+    "NOT b == 7",
+    "NOT (t < 200 OR t > 300)",
+    "a > 1e9",
+    "a != a",
+    "a == a",
+    "NOT a > 0",
+    "a != 0 AND t < 250",
+    "c > 100 OR c < -100",
+    "c == 0",
+    "t / 2 > 200",
+    "b / (t - 250) > 0",
+    "b % 3 == 1",
+    "t % 100 < 1",
+    "-a > 5 | b < 1",
+    "~(d > 5) & t * 2 > 900",
+    "(a + c) / 2 >= 10 AND NOT d != 3",
+    "abs(a) < 0.5",
+    "d",
+]
+
+def make_columns(rows, seed):
+    '''random walks, ordered time, stepped integers and float32 noise, with NaN gaps and scattered NaN'''
+    rng = numpy.random.default_rng(seed)
+    t = numpy.arange(rows) * 0.01
+    a = numpy.cumsum(rng.standard_normal(rows))
+    a[rng.random(rows) < 0.001] = numpy.nan
+    a[rows // 2:rows // 2 + rows // 30] = numpy.nan
+    b = (numpy.arange(rows) // max(rows // 16, 1)).astype(numpy.int32)
+    c = (rng.standard_normal(rows) * 100).astype(numpy.float32)
+    c[rng.random(rows) < 0.0005] = numpy.nan
+    d = numpy.round(rng.random(rows) * 10)
+    return {"a": a, "b": b, "c": c, "d": d}, t
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare filter results with and without zone map pruning.')
+    parser.add_argument('-n', '--rows', metavar='ROWS', type=int,
+                        help='rows of generated data', default=50000)
+    parser.add_argument('-z', '--zonerows', metavar='ROWS', type=int,
+                        help='rows per zone map chunk', default=1000)
+    parser.add_argument('-s', '--seed', metavar='SEED', type=int,
+                        help='random seed of the generated data', default=1)
+
+    args = parser.parse_args()
+
+    data, t = make_columns(args.rows, args.seed)
+    plain = dict(data)
+    plain["t"] = t
+
+    csv_analyzer.ZONE_MAP_ROWS = args.zonerows
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = SessionStore(os.path.join(tmpdir, "zones.columns"))
+        store.save(data, t, {}, [])
+        mapped, x_axis, _, _ = store.load()
+        mapped["t"] = x_axis
+
+        failed = 0
+        for text in EXPRESSIONS:
+            with numpy.errstate(all='ignore'):
+                expected = FilterExpression(text).evaluate(plain, args.rows)
+                pruned = FilterExpression(text).evaluate(mapped, args.rows)
+            same = numpy.array_equal(expected, pruned)
+            failed += not same
+            print("%-45s %8i rows  %s" % (text, expected.sum(), "ok" if same else "MISMATCH (%i rows)" % pruned.sum()))
+        mapped = None
+        x_axis = None
+
+    print("%i of %i expressions differ" % (failed, len(EXPRESSIONS)))
+    return 1 if failed > 0 else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -30,18 +30,30 @@ def main():
 
     bigreader_raw = BigCSVReader()
     start = time.time()
-    data, xaxis = bigreader_raw.get_csv_data(args.file, args.columns, args.xaxis, args.rowstart, args.rowend, True)
+    data, xaxis = bigreader_raw.get_csv_data(args.file, args.columns, args.xaxis, args.rowstart, args.rowend, True,
+                                             useindex=False)
     end = time.time()
-    print("Processed CSV using raw I/O in %f seconds", end - start)
+    print("Processed CSV using raw I/O in %f seconds" % (end - start))
     
     data = None
     xaxis = None
 
     bigreader_csv = BigCSVReader()
     start = time.time()
-    data, xaxis = bigreader_csv.get_csv_data(args.file, args.columns, args.xaxis, args.rowstart, args.rowend, False)
+    data, xaxis = bigreader_csv.get_csv_data(args.file, args.columns, args.xaxis, args.rowstart, args.rowend, False,
+                                             useindex=False)
     end = time.time()
-    print("Processed CSV using csv module in %f seconds", end - start)
+    print("Processed CSV using csv module in %f seconds" % (end - start))
+
+    data = None
+    xaxis = None
+
+    bigreader_block = BigCSVReader()
+    start = time.time()
+    data, xaxis = bigreader_block.get_csv_data(args.file, args.columns, args.xaxis, args.rowstart, args.rowend, False, True,
+                                               useindex=False)
+    end = time.time()
+    print("Processed CSV using block parser in %f seconds" % (end - start))
 
     data = None
     xaxis = None
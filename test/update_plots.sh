@@ -5,8 +5,19 @@ then
     exit
 fi
 
-rm -f csvsession.pickle
-python ../csv_analyzer/csv_analyzer.py t x y offx offy v -f $1 -x t --sessionstart --terminate --colorbyplot
+rm -f csvsession.columns
+# keep the data loaded in a plot server, the plots below are drawn by it
+python ../csv_analyzer/csv_analyzer.py t x y offx offy v -f $1 -x t --sessionstart --server --colorbyplot &
+server_pid=$!
+while [ ! -S csvsession.sock ]
+do
+    if ! kill -0 $server_pid 2>/dev/null
+    then
+        echo "the plot server failed to load $1"
+        exit 1
+    fi
+    sleep 0.1
+done
 python ../csv_analyzer/csv_analyzer.py t v --title "Mouse Speed" --sessioncontinue --colorbyplot &
 python ../csv_analyzer/csv_analyzer.py t v x -x t --filter "SELECT x WHERE v > 150" --sessioncontinue --colorbyplot --title "x WHERE v > 150" &
 python ../csv_analyzer/csv_analyzer.py t v x -x t --filter "SELECT x WHERE t > 1.5" --sessioncontinue --colorbyplot --title "x WHERE t > 1.5" &